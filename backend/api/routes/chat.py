@@ -2,14 +2,17 @@
 Chat API endpoints with streaming support
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
 from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from typing import AsyncGenerator, Dict, List, Optional
 import json
 import asyncio
 
-from core.database import get_db
+from core.config import settings
+from core.database import get_db, AsyncSessionLocal
+from core.db_router import db_router
 from core.auth import get_current_user
 from models.user import User
 from models.conversation import Conversation, Message
@@ -20,6 +23,9 @@ from schemas.chat import (
 from services.llm_service import LLMService
 from services.rag_service import RAGService
 from services.file_service import FileService
+from services.archive_service import rehydrate_if_archived
+from services.stream_registry import StreamBuffer, stream_registry
+from services.speculative_service import speculative_engine, get_tenant_id
 
 router = APIRouter()
 
@@ -37,6 +43,11 @@ async def send_message(
         conversation = await get_or_create_conversation(
             db, request.conversation_id, current_user.id
         )
+        llm_service = LLMService()
+        model = request.model or llm_service.default_model
+        
+        # Check for a prefetched response (must run before the user message is saved)
+        prefetched = await lookup_speculative_response(db, conversation, request, current_user, model)
         
         # Save user message
         user_message = Message(
@@ -47,6 +58,7 @@ async def send_message(
         )
         db.add(user_message)
         await db.commit()
+        await db_router.mark_write(conversation.id)
         
         # Get conversation history
         history = await get_conversation_history(db, conversation.id, limit=10)
@@ -62,14 +74,16 @@ async def send_message(
             )
         
         # Generate response using LLM
-        llm_service = LLMService()
-        response_text, token_count = await llm_service.generate_response(
-            message=request.message,
-            history=history,
-            context=context,
-            model=request.model,
-            temperature=request.temperature
-        )
+        if prefetched:
+            response_text, token_count = prefetched
+        else:
+            response_text, token_count = await llm_service.generate_response(
+                message=request.message,
+                history=history,
+                context=context,
+                model=request.model,
+                temperature=request.temperature
+            )
         
         # Save assistant message
         assistant_message = Message(
@@ -77,8 +91,8 @@ async def send_message(
             role="assistant",
             content=response_text,
             token_count=token_count,
-            model=request.model or llm_service.default_model,
-            metadata={"context_used": context is not None}
+            model=model,
+            metadata={"context_used": context is not None, "speculative": prefetched is not None}
         )
         db.add(assistant_message)
         
@@ -87,6 +101,11 @@ async def send_message(
             conversation.title = request.message[:100]
         
         await db.commit()
+        await db_router.mark_write(conversation.id)
+        
+        schedule_speculative_followups(
+            conversation.id, current_user, model, history, response_text, request.use_rag
+        )
         
         return ChatResponse(
             conversation_id=str(conversation.id),
@@ -114,62 +133,13 @@ async def stream_message(
     """
     async def generate_stream():
         try:
-            # Get or create conversation
-            conversation = await get_or_create_conversation(
-                db, request.conversation_id, current_user.id
-            )
-            
-            # Save user message
-            user_message = Message(
-                conversation_id=conversation.id,
-                role="user",
-                content=request.message
-            )
-            db.add(user_message)
-            await db.commit()
-            
-            # Get conversation history
-            history = await get_conversation_history(db, conversation.id, limit=10)
-            
-            # Get RAG context if enabled
-            context = None
-            if request.use_rag:
-                rag_service = RAGService()
-                context = await rag_service.get_relevant_context(
-                    request.message,
-                    user_id=current_user.id
-                )
-            
-            # Stream response from LLM
-            llm_service = LLMService()
-            full_response = ""
-            token_count = 0
-            
-            async for chunk in llm_service.stream_response(
-                message=request.message,
-                history=history,
-                context=context,
-                model=request.model
-            ):
-                full_response += chunk
-                token_count += 1
-                
-                # Send chunk to client
-                yield f"data: {json.dumps({'chunk': chunk, 'done': False})}\n\n"
-            
-            # Save assistant message
-            assistant_message = Message(
-                conversation_id=conversation.id,
-                role="assistant",
-                content=full_response,
-                token_count=token_count,
-                model=request.model or llm_service.default_model
-            )
-            db.add(assistant_message)
-            await db.commit()
-            
-            # Send completion signal
-            yield f"data: {json.dumps({'chunk': '', 'done': True, 'message_id': str(assistant_message.id)})}\n\n"
+            async for event in stream_chat_turn(db, request, current_user):
+                if event["type"] == "chunk":
+                    # Send chunk to client
+                    yield f"data: {json.dumps({'chunk': event['chunk'], 'done': False})}\n\n"
+                elif event["type"] == "done":
+                    # Send completion signal
+                    yield f"data: {json.dumps({'chunk': '', 'done': True, 'message_id': event['message_id']})}\n\n"
             
         except Exception as e:
             error_data = json.dumps({'error': str(e), 'done': True})
@@ -180,6 +150,180 @@ async def stream_message(
         media_type="text/event-stream"
     )
 
+@router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket, token: Optional[str] = None):
+    """
+    Multiplexed chat channel
+    
+    Authenticates once (``?token=`` or a first ``{"type": "auth"}`` frame), then
+    accepts frames for any number of conversations:
+    
+    - ``{"type": "chat", "request_id", "conversation_id", "message", "model", "use_rag"}``
+      starts a stream and replies ``stream_start`` with its ``stream_id``
+    - ``{"type": "resume", "stream_id", "offset"}`` replays a stream from
+      ``offset`` (the number of chunks already received) and follows it
+    - ``{"type": "cancel", "stream_id"}`` stops the upstream generation
+    
+    Streams send ``chunk`` frames (with ``offset``) and end with ``done`` or
+    ``error``. A stream whose connection drops keeps generating for
+    STREAM_RESUME_GRACE_SECONDS so a reconnecting client can resume it, on
+    any worker. A connection follows at most WS_MAX_STREAMS_PER_CONNECTION
+    streams and a user runs at most STREAM_MAX_LIVE_PER_USER generations.
+    Malformed frames, and frames that fail (e.g. Redis is unavailable), get an
+    ``error`` reply and are skipped.
+    """
+    await websocket.accept()
+    
+    if token is None:
+        try:
+            frame = await receive_frame(websocket)
+        except WebSocketDisconnect:
+            return
+        except ValueError:
+            frame = {}
+        if frame.get("type") == "auth":
+            token = frame.get("token")
+    
+    current_user = await authenticate_websocket(token)
+    if current_user is None:
+        await websocket.close(code=4401, reason="Invalid authentication credentials")
+        return
+    
+    send_lock = asyncio.Lock()
+    forwarders: Dict[str, asyncio.Task] = {}
+    
+    async def send(payload: dict):
+        async with send_lock:
+            await websocket.send_json(payload)
+    
+    async def forward(buffer: StreamBuffer, offset: int):
+        try:
+            await buffer.attach()
+            try:
+                async for event in buffer.read_from(offset):
+                    await send({**event, "stream_id": buffer.stream_id})
+            finally:
+                await buffer.detach()
+        except Exception as e:
+            try:
+                await send({"type": "error", "stream_id": buffer.stream_id, "error": str(e)})
+            except Exception:
+                pass  # Connection already gone
+        finally:
+            if forwarders.get(buffer.stream_id) is asyncio.current_task():
+                del forwarders[buffer.stream_id]
+    
+    def follow(buffer: StreamBuffer, offset: int):
+        previous = forwarders.pop(buffer.stream_id, None)
+        if previous:
+            previous.cancel()
+        forwarders[buffer.stream_id] = asyncio.create_task(forward(buffer, offset))
+    
+    async def handle(frame: dict):
+        frame_type = frame.get("type")
+        
+        if frame_type == "chat":
+            if len(forwarders) >= settings.WS_MAX_STREAMS_PER_CONNECTION:
+                await send({
+                    "type": "error",
+                    "request_id": frame.get("request_id"),
+                    "error": "Too many concurrent streams on this connection"
+                })
+                return
+            try:
+                request = StreamChatRequest.model_validate(frame)
+            except ValidationError as e:
+                await send({"type": "error", "request_id": frame.get("request_id"), "error": str(e)})
+                return
+            
+            # Capped per user, so reconnecting does not allow more generations
+            buffer = await stream_registry.create(current_user.id)
+            if buffer is None:
+                await send({
+                    "type": "error",
+                    "request_id": frame.get("request_id"),
+                    "error": "Too many concurrent streams for this user"
+                })
+                return
+            stream_registry.start(buffer, run_buffered_turn(buffer, request, current_user))
+            await send({
+                "type": "stream_start",
+                "request_id": frame.get("request_id"),
+                "stream_id": buffer.stream_id
+            })
+            follow(buffer, 0)
+        
+        elif frame_type == "resume":
+            stream_id = str(frame.get("stream_id", ""))
+            try:
+                offset = max(int(frame.get("offset", 0)), 0)
+            except (TypeError, ValueError):
+                await send({"type": "error", "stream_id": stream_id, "error": "Invalid offset"})
+                return
+            if stream_id not in forwarders and len(forwarders) >= settings.WS_MAX_STREAMS_PER_CONNECTION:
+                await send({
+                    "type": "error",
+                    "stream_id": stream_id,
+                    "error": "Too many concurrent streams on this connection"
+                })
+                return
+            buffer = await stream_registry.get(stream_id, current_user.id)
+            if buffer is None:
+                await send({"type": "error", "stream_id": stream_id, "error": "Stream not found"})
+                return
+            follow(buffer, offset)
+        
+        elif frame_type == "cancel":
+            stream_id = str(frame.get("stream_id", ""))
+            if await stream_registry.get(stream_id, current_user.id):
+                await stream_registry.cancel(stream_id)
+        
+        elif frame_type == "ping":
+            await send({"type": "pong"})
+        
+        else:
+            await send({"type": "error", "error": f"Unknown frame type: {frame_type}"})
+    
+    try:
+        while True:
+            try:
+                frame = await receive_frame(websocket)
+            except ValueError as e:
+                # Malformed frames are rejected one at a time; the channel stays open
+                await send({"type": "error", "error": f"Invalid frame: {e}"})
+                continue
+            try:
+                await handle(frame)
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                # e.g. Redis unavailable: fail this frame, keep the channel open
+                await send({
+                    "type": "error",
+                    "request_id": frame.get("request_id"),
+                    "stream_id": frame.get("stream_id"),
+                    "error": f"Failed to handle {frame.get('type')} frame: {e}"
+                })
+    
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Detach from in-flight streams; they stay resumable for the grace period
+        for task in list(forwarders.values()):
+            task.cancel()
+
+@router.get("/speculative/stats")
+async def get_speculative_stats(current_user: User = Depends(get_current_user)):
+    """
+    Speculative prefetch metrics for the current user's tenant
+    """
+    tenant_id = get_tenant_id(current_user)
+    return {
+        "enabled": settings.SPECULATIVE_ENABLED,
+        "tenant_id": tenant_id,
+        **(await speculative_engine.stats(tenant_id)).to_dict()
+    }
+
 @router.post("/upload")
 async def upload_file(
     request: FileUploadRequest,
@@ -239,27 +383,32 @@ async def get_messages(
     from sqlalchemy import select
     from uuid import UUID
     
-    # Verify conversation belongs to user
-    stmt = select(Conversation).where(
-        Conversation.id == UUID(conversation_id),
-        Conversation.user_id == current_user.id
-    )
-    result = await db.execute(stmt)
-    conversation = result.scalar_one_or_none()
-    
-    if not conversation:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation not found"
+    async with db_router.read_session(conversation_id) as read_db:
+        # Verify conversation belongs to user
+        stmt = select(Conversation).where(
+            Conversation.id == UUID(conversation_id),
+            Conversation.user_id == current_user.id
         )
-    
-    # Get messages
-    stmt = select(Message).where(
-        Message.conversation_id == UUID(conversation_id)
-    ).order_by(Message.created_at.desc()).limit(limit).offset(offset)
-    
-    result = await db.execute(stmt)
-    messages = result.scalars().all()
+        result = await read_db.execute(stmt)
+        conversation = result.scalar_one_or_none()
+        
+        if not conversation:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversation not found"
+            )
+        
+        # Restore archived messages before reading (restored rows are on the primary)
+        if await rehydrate_if_archived(db, conversation.id, read_db=read_db):
+            read_db = db
+        
+        # Get messages
+        stmt = select(Message).where(
+            Message.conversation_id == UUID(conversation_id)
+        ).order_by(Message.created_at.desc()).limit(limit).offset(offset)
+        
+        result = await read_db.execute(stmt)
+        messages = result.scalars().all()
     
     return [
         MessageResponse(
@@ -299,6 +448,7 @@ async def get_or_create_conversation(
     db.add(conversation)
     await db.commit()
     await db.refresh(conversation)
+    await db_router.mark_write(conversation.id)
     
     return conversation
 
@@ -311,14 +461,185 @@ async def get_conversation_history(
     from sqlalchemy import select
     from uuid import UUID
     
-    stmt = select(Message).where(
-        Message.conversation_id == UUID(conversation_id)
-    ).order_by(Message.created_at.desc()).limit(limit)
+    conversation_id = UUID(str(conversation_id))
     
-    result = await db.execute(stmt)
-    messages = result.scalars().all()
+    async with db_router.read_session(conversation_id) as read_db:
+        # Restore archived messages before reading (restored rows are on the primary)
+        if await rehydrate_if_archived(db, conversation_id, read_db=read_db):
+            read_db = db
+        
+        stmt = select(Message).where(
+            Message.conversation_id == conversation_id
+        ).order_by(Message.created_at.desc()).limit(limit)
+        
+        result = await read_db.execute(stmt)
+        messages = result.scalars().all()
     
     return [
         {"role": msg.role, "content": msg.content}
         for msg in reversed(messages)
     ]
+
+async def stream_chat_turn(
+    db: AsyncSession,
+    request: StreamChatRequest,
+    current_user: User
+) -> AsyncGenerator[dict, None]:
+    """
+    Run one streamed chat turn
+    
+    Yields a ``start`` event with the conversation ID, a ``chunk`` event per
+    LLM chunk, and a final ``done`` event with the saved message ID.
+    """
+    # Get or create conversation
+    conversation = await get_or_create_conversation(
+        db, request.conversation_id, current_user.id
+    )
+    yield {"type": "start", "conversation_id": str(conversation.id)}
+    llm_service = LLMService()
+    model = request.model or llm_service.default_model
+    
+    # Check for a prefetched response (must run before the user message is saved)
+    prefetched = await lookup_speculative_response(db, conversation, request, current_user, model)
+    
+    # Save user message
+    user_message = Message(
+        conversation_id=conversation.id,
+        role="user",
+        content=request.message
+    )
+    db.add(user_message)
+    await db.commit()
+    await db_router.mark_write(conversation.id)
+    
+    # Get conversation history
+    history = await get_conversation_history(db, conversation.id, limit=10)
+    
+    # Get RAG context if enabled
+    context = None
+    if request.use_rag:
+        rag_service = RAGService()
+        context = await rag_service.get_relevant_context(
+            request.message,
+            user_id=current_user.id
+        )
+    
+    # Stream response from LLM
+    if prefetched:
+        full_response, token_count = prefetched
+        yield {"type": "chunk", "chunk": full_response}
+    else:
+        full_response = ""
+        token_count = 0
+        
+        async for chunk in llm_service.stream_response(
+            message=request.message,
+            history=history,
+            context=context,
+            model=request.model
+        ):
+            full_response += chunk
+            token_count += 1
+            yield {"type": "chunk", "chunk": chunk}
+    
+    # Save assistant message
+    assistant_message = Message(
+        conversation_id=conversation.id,
+        role="assistant",
+        content=full_response,
+        token_count=token_count,
+        model=model
+    )
+    db.add(assistant_message)
+    await db.commit()
+    await db_router.mark_write(conversation.id)
+    
+    schedule_speculative_followups(
+        conversation.id, current_user, model, history, full_response, request.use_rag
+    )
+    
+    yield {"type": "done", "message_id": str(assistant_message.id)}
+
+async def lookup_speculative_response(
+    db: AsyncSession,
+    conversation: Conversation,
+    request,
+    current_user: User,
+    model: str
+) -> Optional[tuple[str, int]]:
+    """Get a prefetched response if this prompt was predicted for the conversation"""
+    tenant_id = get_tenant_id(current_user)
+    # Speculative responses are generated without RAG context
+    if request.use_rag or not speculative_engine.is_predicted(tenant_id, request.message):
+        return None
+    prior_history = await get_conversation_history(db, conversation.id, limit=10)
+    return await speculative_engine.lookup(
+        tenant_id, conversation.id, model, request.message, prior_history
+    )
+
+def schedule_speculative_followups(
+    conversation_id,
+    current_user: User,
+    model: str,
+    history: List[dict],
+    response_text: str,
+    use_rag: bool
+):
+    """Prefetch the tenant's follow-ups for the conversation as it now stands"""
+    if use_rag:
+        return
+    # Same window get_conversation_history(limit=10) returns on the next turn
+    next_history = (history + [{"role": "assistant", "content": response_text}])[-10:]
+    speculative_engine.schedule(get_tenant_id(current_user), conversation_id, model, next_history)
+
+async def run_buffered_turn(
+    buffer: StreamBuffer,
+    request: StreamChatRequest,
+    current_user: User
+):
+    """Run a chat turn into a resumable stream buffer"""
+    async with AsyncSessionLocal() as db:
+        try:
+            async for event in stream_chat_turn(db, request, current_user):
+                if event["type"] == "start":
+                    buffer.conversation_id = event["conversation_id"]
+                elif event["type"] == "chunk":
+                    await buffer.append(event["chunk"])
+                elif event["type"] == "done":
+                    await buffer.finish(message_id=event["message_id"])
+        except asyncio.CancelledError:
+            # The registry records the cancellation in the buffer
+            await db.rollback()
+            raise
+        except Exception as e:
+            await db.rollback()
+            await buffer.finish(error=str(e))
+
+async def receive_frame(websocket: WebSocket) -> dict:
+    """
+    Receive one JSON object frame
+    
+    Raises:
+        WebSocketDisconnect: The client disconnected
+        ValueError: The frame is not a JSON object
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    data = message.get("text")
+    if data is None:
+        data = (message.get("bytes") or b"").decode("utf-8")
+    frame = json.loads(data)
+    if not isinstance(frame, dict):
+        raise ValueError("expected a JSON object")
+    return frame
+
+async def authenticate_websocket(token: Optional[str]) -> Optional[User]:
+    """Resolve a bearer token to a user once per WebSocket connection"""
+    if not token:
+        return None
+    async with AsyncSessionLocal() as db:
+        try:
+            return await get_current_user(token=token, db=db)
+        except HTTPException:
+            return None
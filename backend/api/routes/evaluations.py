@@ -0,0 +1,100 @@
+"""
+Rubric evaluation API endpoints
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+
+from core.database import get_db
+from core.auth import get_current_user
+from models.user import User
+from schemas.evaluation import (
+    CohortEvaluationRequest, CohortEvaluationResponse, CriterionScore,
+    EvaluationRequest, EvaluationResponse
+)
+from services.evaluation_service import EvaluationService
+
+router = APIRouter()
+
+@router.post("/", response_model=EvaluationResponse)
+async def evaluate_submission(
+    request: EvaluationRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Score one submission against a rubric
+    """
+    try:
+        evaluation_service = EvaluationService()
+        result = await evaluation_service.evaluate(
+            request.rubric, request.submission, model=request.model, mode=request.mode
+        )
+        await evaluation_service.save_scores(db, [result], evaluated_by=UUID(str(current_user.id)))
+        return result
+        
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error evaluating submission: {str(e)}"
+        )
+
+@router.post("/cohort", response_model=CohortEvaluationResponse)
+async def evaluate_cohort(
+    request: CohortEvaluationRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Score a cohort of submissions against one rubric
+    
+    Submissions that fail are listed under ``errors``; the rest are scored and saved.
+    """
+    try:
+        evaluation_service = EvaluationService()
+        result = await evaluation_service.evaluate_cohort(
+            request.rubric, request.submissions, model=request.model, mode=request.mode
+        )
+        await evaluation_service.save_scores(
+            db, result.results, evaluated_by=UUID(str(current_user.id))
+        )
+        return result
+        
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error evaluating cohort: {str(e)}"
+        )
+
+@router.get("/{rubric_id}/{submission_id}", response_model=list[CriterionScore])
+async def get_scores(
+    rubric_id: str,
+    submission_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get saved scores for a submission
+    """
+    scores = await EvaluationService().get_scores(
+        db, rubric_id, submission_id, evaluated_by=UUID(str(current_user.id))
+    )
+    
+    if not scores:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Evaluation not found"
+        )
+    
+    return [
+        CriterionScore(
+            criterion=score.criterion,
+            score=score.score,
+            max_score=score.max_score,
+            rationale=score.rationale or ""
+        )
+        for score in scores
+    ]
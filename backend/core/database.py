@@ -2,26 +2,26 @@
 Database configuration and session management
 """
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.pool import NullPool
 from core.config import settings
+from core.partitioning import (
+    MESSAGES_TABLE, acquire_maintenance_lock, ensure_history_index, maintain_message_partitions,
+    prepare_message_table
+)
+from typing import Optional
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Create async engine
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    pool_size=settings.DATABASE_POOL_SIZE,
-    max_overflow=settings.DATABASE_MAX_OVERFLOW,
-    pool_pre_ping=True,
-)
+# Async engine, created lazily by init_engine() (normally from the app lifespan)
+# so importing this module does not load the DB driver or build a pool.
+engine: Optional[AsyncEngine] = None
 
-# Create async session factory
+# Create async session factory (bound to the engine in init_engine)
 AsyncSessionLocal = async_sessionmaker(
-    engine,
     class_=AsyncSession,
     expire_on_commit=False,
     autocommit=False,
@@ -31,19 +31,95 @@ AsyncSessionLocal = async_sessionmaker(
 # Base class for models
 Base = declarative_base()
 
+def init_engine() -> AsyncEngine:
+    """Create the async engine on first call and bind the session factory"""
+    global engine
+    if engine is None:
+        engine = create_async_engine(
+            settings.DATABASE_URL,
+            echo=settings.DEBUG,
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_pre_ping=True,
+        )
+        AsyncSessionLocal.configure(bind=engine)
+    return engine
+
+def get_engine() -> AsyncEngine:
+    """Return the async engine, creating it if needed"""
+    return init_engine()
+
+async def warmup_db(connections: Optional[int] = None):
+    """Open pooled connections up front so the first requests don't pay for them"""
+    db_engine = init_engine()
+    count = min(connections or settings.DATABASE_WARMUP_CONNECTIONS, settings.DATABASE_POOL_SIZE)
+    
+    async def _ping():
+        async with db_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    
+    # Hold all connections at once so the pool really grows to `count`
+    await asyncio.gather(*(_ping() for _ in range(count)))
+    logger.info(f"Database pool warmed up with {count} connections")
+
 async def init_db():
     """Initialize database tables"""
     try:
-        async with engine.begin() as conn:
+        async with init_engine().begin() as conn:
+            is_postgres = conn.dialect.name == "postgresql"
+            if is_postgres:
+                # Every worker runs this at boot; apply the DDL one worker at a time
+                await acquire_maintenance_lock(conn)
+            messages_table = Base.metadata.tables.get(MESSAGES_TABLE)
+            if messages_table is not None:
+                prepare_message_table(
+                    messages_table,
+                    partitioned=is_postgres and settings.MESSAGE_PARTITIONING_ENABLED
+                )
             await conn.run_sync(Base.metadata.create_all)
+            if messages_table is not None:
+                await ensure_history_index(conn, messages_table)
+            if is_postgres and messages_table is not None and settings.MESSAGE_PARTITIONING_ENABLED:
+                await maintain_message_partitions(conn)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error initializing database: {e}")
         raise
 
+async def run_partition_maintenance() -> bool:
+    """
+    Run one partition maintenance pass on the primary
+
+    Returns:
+        False if skipped (not PostgreSQL, or another worker holds the lock)
+    """
+    async with init_engine().begin() as conn:
+        if conn.dialect.name != "postgresql":
+            return False
+        if not await acquire_maintenance_lock(conn, wait=False):
+            return False
+        await maintain_message_partitions(conn)
+        return True
+
+async def run_partition_maintenance_loop():
+    """Background task: maintain message partitions every MESSAGE_PARTITION_MAINTENANCE_SECONDS"""
+    while True:
+        # init_db has just run a pass, so wait first
+        await asyncio.sleep(settings.MESSAGE_PARTITION_MAINTENANCE_SECONDS)
+        try:
+            await run_partition_maintenance()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in partition maintenance: {e}")
+
 async def close_db():
     """Close database connections"""
+    global engine
+    if engine is None:
+        return
     await engine.dispose()
+    engine = None
     logger.info("Database connections closed")
 
 async def get_db() -> AsyncSession:
@@ -0,0 +1,173 @@
+"""
+Read-replica routing for read-only database sessions
+"""
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+from uuid import UUID
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from core.config import settings
+from core.database import AsyncSessionLocal
+from core.redis_client import get_redis
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Replay delay on a PostgreSQL standby; 0 when it has replayed everything it received
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+def _conversation_key(conversation_id) -> str:
+    """Canonical form so UUID objects and path strings share one entry"""
+    try:
+        return str(UUID(str(conversation_id)))
+    except ValueError:
+        return str(conversation_id)
+
+class Replica:
+    """A read replica with its own pool and routing state"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.engine: AsyncEngine = create_async_engine(
+            url,
+            echo=settings.DEBUG,
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_pre_ping=True,
+        )
+        self.sessionmaker = async_sessionmaker(
+            self.engine,
+            class_=AsyncSession,
+            expire_on_commit=False,
+            autoflush=False,
+        )
+        self.in_flight = 0
+        self.lag: float = 0.0
+        self.lag_checked_at: float = 0.0
+        self._lag_lock = asyncio.Lock()
+
+    async def refresh_lag(self):
+        """Re-measure replication lag if the last measurement is stale"""
+        if time.monotonic() - self.lag_checked_at < settings.DATABASE_REPLICA_LAG_CHECK_SECONDS:
+            return
+        if self._lag_lock.locked():
+            return  # Another request is measuring; use the last known value
+        async with self._lag_lock:
+            # The probe runs inline in a read request: an unreachable replica
+            # must cost at most the timeout, then it is skipped as lagging
+            try:
+                self.lag = await asyncio.wait_for(
+                    self._measure_lag(), settings.DATABASE_REPLICA_LAG_TIMEOUT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"Replica lag check timed out for {self.engine.url.host}")
+                self.lag = float("inf")
+            except Exception as e:
+                logger.warning(f"Replica lag check failed for {self.engine.url.host}: {e}")
+                self.lag = float("inf")
+            self.lag_checked_at = time.monotonic()
+
+    async def _measure_lag(self) -> float:
+        async with self.engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                return float((await conn.execute(REPLICA_LAG_QUERY)).scalar() or 0)
+            await conn.execute(text("SELECT 1"))
+            return 0.0
+
+class DatabaseRouter:
+    """
+    Routes read-only sessions to replicas
+
+    Picks the replica with the fewest in-flight sessions among those within
+    DATABASE_REPLICA_MAX_LAG_SECONDS, and falls back to the primary when none
+    qualify. Conversations written in the last DATABASE_READ_YOUR_WRITES_SECONDS
+    are read from the primary so clients see their own writes. The write marker
+    is a Redis key with that TTL, so it holds across workers; if Redis is
+    unavailable reads go to the primary.
+    """
+
+    STICKY_PREFIX = "db:written:"
+
+    def __init__(self, replica_urls: Optional[List[str]] = None):
+        self._replica_urls = replica_urls
+        self._replicas: Optional[List[Replica]] = None
+
+    @property
+    def replicas(self) -> List[Replica]:
+        # Engines are created on first use, like the primary engine
+        if self._replicas is None:
+            urls = settings.DATABASE_REPLICA_URLS if self._replica_urls is None else self._replica_urls
+            self._replicas = [Replica(url) for url in urls]
+        return self._replicas
+
+    async def mark_write(self, conversation_id):
+        """Pin reads of a conversation to the primary for the stickiness window"""
+        if not self.replicas:
+            return  # Every read already goes to the primary
+        try:
+            await get_redis().set(
+                self.STICKY_PREFIX + _conversation_key(conversation_id),
+                1,
+                px=max(int(settings.DATABASE_READ_YOUR_WRITES_SECONDS * 1000), 1)
+            )
+        except Exception as e:
+            logger.warning(f"Failed to record write for conversation {conversation_id}: {e}")
+
+    async def is_sticky(self, conversation_id) -> bool:
+        if conversation_id is None:
+            return False
+        try:
+            return bool(await get_redis().exists(
+                self.STICKY_PREFIX + _conversation_key(conversation_id)
+            ))
+        except Exception as e:
+            logger.warning(f"Read-your-writes check failed, reading from primary: {e}")
+            return True
+
+    async def pick_replica(self) -> Optional[Replica]:
+        """Least-connections choice among replicas within the lag threshold"""
+        if not self.replicas:
+            return None
+        await asyncio.gather(*(replica.refresh_lag() for replica in self.replicas))
+        candidates = [
+            replica for replica in self.replicas
+            if replica.lag <= settings.DATABASE_REPLICA_MAX_LAG_SECONDS
+        ]
+        if not candidates:
+            return None
+        fewest = min(replica.in_flight for replica in candidates)
+        return random.choice([replica for replica in candidates if replica.in_flight == fewest])
+
+    @asynccontextmanager
+    async def read_session(self, conversation_id=None) -> AsyncIterator[AsyncSession]:
+        """Session for read-only queries, on a replica when it is safe to use one"""
+        replica = None
+        if self.replicas and not await self.is_sticky(conversation_id):
+            replica = await self.pick_replica()
+        if replica is None:
+            async with AsyncSessionLocal() as session:
+                yield session
+            return
+
+        replica.in_flight += 1
+        try:
+            async with replica.sessionmaker() as session:
+                yield session
+        finally:
+            replica.in_flight -= 1
+
+    async def dispose(self):
+        """Close replica connections"""
+        if self._replicas:
+            await asyncio.gather(*(replica.engine.dispose() for replica in self._replicas))
+            logger.info("Replica connections closed")
+        self._replicas = None
+
+db_router = DatabaseRouter()
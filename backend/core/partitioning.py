@@ -0,0 +1,257 @@
+"""
+Time-range partitioning for the messages table (PostgreSQL)
+"""
+
+from datetime import date, datetime, timezone
+from typing import List, Optional
+from sqlalchemy import Index, Table, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+MESSAGES_TABLE = "messages"
+PARTITION_COLUMN = "created_at"
+# Serves the conversation_id + created_at lookups in history/message listing
+MESSAGE_HISTORY_INDEX = "ix_messages_conversation_id_created_at"
+DEFAULT_PARTITION = f"{MESSAGES_TABLE}_default"
+
+# Arbitrary constant shared by the jobs that change the messages table layout
+# (schema setup at boot, partition maintenance), so only one worker runs DDL at
+# a time. Held only for the few statements of one pass; the archiver uses its
+# own key so booting workers never wait on an archive batch.
+RETENTION_LOCK_KEY = 720_271
+
+def _month_start(value: date, offset: int = 0) -> date:
+    """First day of the month `offset` months away from `value`"""
+    month_index = value.year * 12 + value.month - 1 + offset
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def _partition_name(month: date) -> str:
+    return f"{MESSAGES_TABLE}_p{month.year:04d}_{month.month:02d}"
+
+def _parse_partition_name(name: str) -> Optional[date]:
+    """Inverse of _partition_name; None for the default or foreign partitions"""
+    prefix = f"{MESSAGES_TABLE}_p"
+    if not name.startswith(prefix):
+        return None
+    try:
+        year, month = name[len(prefix):].split("_")
+        return date(int(year), int(month), 1)
+    except ValueError:
+        return None
+
+def _partition_bounds(month: date) -> str:
+    return (
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_month_start(month, 1).isoformat()}')"
+    )
+
+async def acquire_maintenance_lock(conn: AsyncConnection, wait: bool = True) -> bool:
+    """
+    Take the cluster-wide maintenance lock for the current transaction
+
+    Args:
+        wait: Block until the lock is free instead of giving up immediately
+
+    Returns:
+        True if the lock is held; it is released when the transaction ends
+    """
+    if wait:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": RETENTION_LOCK_KEY})
+        return True
+    result = await conn.execute(
+        text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": RETENTION_LOCK_KEY}
+    )
+    return bool(result.scalar())
+
+def prepare_message_table(table: Table, partitioned: bool):
+    """
+    Adjust the messages table definition before create_all
+
+    Adds the composite history index and, when partitioned, declares the table
+    as RANGE partitioned by created_at. PostgreSQL requires the partition key to
+    be part of the primary key, so created_at is added to it.
+    """
+    if not any(index.name == MESSAGE_HISTORY_INDEX for index in table.indexes):
+        Index(MESSAGE_HISTORY_INDEX, table.c.conversation_id, table.c[PARTITION_COLUMN])
+
+    if not partitioned or table.dialect_options["postgresql"]["partition_by"]:
+        return
+
+    partition_column = table.c[PARTITION_COLUMN]
+    if not partition_column.primary_key:
+        partition_column.primary_key = True
+        partition_column.nullable = False
+        table.primary_key._reload([column for column in table.columns if column.primary_key])
+    table.dialect_kwargs["postgresql_partition_by"] = f"RANGE ({PARTITION_COLUMN})"
+
+async def ensure_history_index(conn: AsyncConnection, table: Table):
+    """
+    Create the composite history index if it is missing
+
+    create_all skips the indexes of tables that already exist, so deployments
+    whose messages table predates the index get it here. Call after
+    prepare_message_table.
+    """
+    index = next(index for index in table.indexes if index.name == MESSAGE_HISTORY_INDEX)
+    await conn.run_sync(lambda sync_conn: index.create(sync_conn, checkfirst=True))
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    """Check whether the messages table exists as a partitioned table"""
+    result = await conn.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+        ),
+        {"table": MESSAGES_TABLE},
+    )
+    return result.scalar() is not None
+
+async def list_partitions(conn: AsyncConnection) -> List[str]:
+    """Names of the partitions currently attached to the messages table"""
+    result = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table AND pg_table_is_visible(p.oid) "
+            "ORDER BY c.relname"
+        ),
+        {"table": MESSAGES_TABLE},
+    )
+    return [row[0] for row in result]
+
+async def _default_partition_months(conn: AsyncConnection) -> List[date]:
+    """Months that have rows sitting in the DEFAULT partition"""
+    result = await conn.execute(text(
+        f"SELECT DISTINCT date_trunc('month', {PARTITION_COLUMN})::date "
+        f'FROM "{DEFAULT_PARTITION}"'
+    ))
+    return [row[0] for row in result]
+
+async def _create_partition_from_default(conn: AsyncConnection, name: str, month: date):
+    """
+    Create a partition for a month whose rows landed in the DEFAULT partition
+
+    PostgreSQL refuses CREATE TABLE ... PARTITION OF while DEFAULT holds rows
+    in the new range, so the table is created detached, the rows are moved
+    into it, and it is attached afterwards.
+    """
+    end = _month_start(month, 1)
+    await conn.execute(text(
+        f'CREATE TABLE "{name}" (LIKE "{MESSAGES_TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+    ))
+    moved = await conn.execute(text(
+        f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" '
+        f"WHERE {PARTITION_COLUMN} >= '{month.isoformat()}' "
+        f"AND {PARTITION_COLUMN} < '{end.isoformat()}' RETURNING *) "
+        f'INSERT INTO "{name}" SELECT * FROM moved'
+    ))
+    await conn.execute(text(
+        f'ALTER TABLE "{MESSAGES_TABLE}" ATTACH PARTITION "{name}" {_partition_bounds(month)}'
+    ))
+    logger.info(f"Moved {moved.rowcount} rows from {DEFAULT_PARTITION} into {name}")
+
+async def ensure_message_partitions(
+    conn: AsyncConnection,
+    months_ahead: Optional[int] = None,
+    today: Optional[date] = None
+) -> List[str]:
+    """
+    Create monthly partitions from the current month up to `months_ahead`
+
+    A DEFAULT partition catches rows outside the created ranges so inserts never
+    fail because maintenance fell behind. Months that already have rows in
+    DEFAULT get their own partition, with those rows moved into it.
+
+    Returns:
+        Names of the partitions that were created
+    """
+    months_ahead = settings.MESSAGE_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    today = today or datetime.now(timezone.utc).date()
+    existing = set(await list_partitions(conn))
+    created = []
+
+    months = {_month_start(today, offset) for offset in range(months_ahead + 1)}
+    spilled = set()
+    if DEFAULT_PARTITION in existing:
+        spilled = set(await _default_partition_months(conn))
+
+    for start in sorted(months | spilled):
+        name = _partition_name(start)
+        if name in existing:
+            continue
+        if start in spilled:
+            await _create_partition_from_default(conn, name, start)
+        else:
+            await conn.execute(text(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{MESSAGES_TABLE}" '
+                f"{_partition_bounds(start)}"
+            ))
+        created.append(name)
+
+    if DEFAULT_PARTITION not in existing:
+        await conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{DEFAULT_PARTITION}" PARTITION OF "{MESSAGES_TABLE}" DEFAULT'
+        ))
+        created.append(DEFAULT_PARTITION)
+
+    if created:
+        logger.info(f"Created message partitions: {', '.join(created)}")
+    return created
+
+async def drop_expired_partitions(
+    conn: AsyncConnection,
+    retention_months: Optional[int] = None,
+    today: Optional[date] = None
+) -> List[str]:
+    """
+    Drop monthly partitions older than the retention window
+
+    Only empty partitions are dropped; rows are removed from them by the
+    conversation archiver, so nothing that has not been archived is lost.
+
+    Returns:
+        Names of the partitions that were dropped
+    """
+    retention_months = (
+        settings.MESSAGE_PARTITION_RETENTION_MONTHS if retention_months is None else retention_months
+    )
+    today = today or datetime.now(timezone.utc).date()
+    cutoff = _month_start(today, -retention_months)
+    dropped = []
+
+    for name in await list_partitions(conn):
+        month = _parse_partition_name(name)
+        if month is None or _month_start(month, 1) > cutoff:
+            continue
+        has_rows = await conn.execute(text(f'SELECT EXISTS (SELECT 1 FROM "{name}")'))
+        if has_rows.scalar():
+            continue
+        await conn.execute(text(f'ALTER TABLE "{MESSAGES_TABLE}" DETACH PARTITION "{name}"'))
+        await conn.execute(text(f'DROP TABLE "{name}"'))
+        dropped.append(name)
+
+    if dropped:
+        logger.info(f"Dropped expired message partitions: {', '.join(dropped)}")
+    return dropped
+
+async def maintain_message_partitions(conn: AsyncConnection):
+    """
+    Create upcoming partitions and drop expired empty ones
+
+    Callers must hold the maintenance lock (see acquire_maintenance_lock).
+    """
+    if not await is_partitioned(conn):
+        logger.warning(
+            f"Table '{MESSAGES_TABLE}' is not partitioned; skipping partition maintenance. "
+            f"History reads use {MESSAGE_HISTORY_INDEX} until it is migrated: create a "
+            f"table PARTITION BY RANGE ({PARTITION_COLUMN}) with {PARTITION_COLUMN} in its "
+            "primary key, copy the rows across in batches, swap the table names in a "
+            "maintenance window, and restart so the monthly partitions are created"
+        )
+        return
+    await ensure_message_partitions(conn)
+    await drop_expired_partitions(conn)
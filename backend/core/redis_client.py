@@ -0,0 +1,23 @@
+"""
+Shared Redis client
+"""
+
+from core.config import settings
+
+_redis = None
+
+def get_redis():
+    """Get the shared Redis client, importing the driver on first use"""
+    global _redis
+    if _redis is None:
+        import redis.asyncio as redis
+
+        _redis = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis
+
+async def close_redis():
+    """Close the shared Redis client"""
+    global _redis
+    if _redis is not None:
+        await _redis.close()
+        _redis = None
@@ -2,16 +2,21 @@
 Enterprise ChatGPT-like System - Main FastAPI Application
 """
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
-import uvicorn
+import asyncio
 
-from api.routes import auth, chat, conversations, users, admin
+from api.routes import auth, chat, conversations, users, admin, evaluations
 from core.config import settings
-from core.database import init_db, close_db
+from core.database import init_db, close_db, warmup_db, run_partition_maintenance_loop
+from core.db_router import db_router
 from core.middleware import RateLimitMiddleware, LoggingMiddleware
+from core.redis_client import close_redis
+from services.llm_service import warmup_llm_clients, close_llm_clients
+from services.archive_service import run_retention_loop
+from services.speculative_service import speculative_engine
+from services.stream_registry import stream_registry
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -20,9 +25,29 @@ async def lifespan(app: FastAPI):
     print("🚀 Starting Enterprise Chat System...")
     await init_db()
     print("✅ Database initialized")
+    if settings.STARTUP_WARMUP:
+        # Runs in every worker before it starts accepting connections
+        await warmup_db()
+        await warmup_llm_clients()
+        print("✅ Connection pools warmed up")
+    background_tasks = []
+    if settings.MESSAGE_PARTITIONING_ENABLED:
+        background_tasks.append(asyncio.create_task(run_partition_maintenance_loop()))
+        print("✅ Partition maintenance job started")
+    if settings.ARCHIVE_ENABLED:
+        background_tasks.append(asyncio.create_task(run_retention_loop()))
+        print("✅ Message retention job started")
     yield
     # Shutdown
     print("🛑 Shutting down...")
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await stream_registry.close()
+    await speculative_engine.close()
+    await close_llm_clients()
+    await close_redis()
+    await db_router.dispose()
     await close_db()
     print("✅ Cleanup completed")
 
@@ -55,6 +80,7 @@ app.include_router(chat.router, prefix="/api/v1/chat", tags=["Chat"])
 app.include_router(conversations.router, prefix="/api/v1/conversations", tags=["Conversations"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["Users"])
 app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin"])
+app.include_router(evaluations.router, prefix="/api/v1/evaluations", tags=["Evaluations"])
 
 @app.get("/")
 async def root():
@@ -76,6 +102,8 @@ async def health_check():
     }
 
 if __name__ == "__main__":
+    import uvicorn
+    
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
@@ -0,0 +1,17 @@
+"""
+Archived conversation model
+"""
+
+from sqlalchemy import Column, DateTime, Integer, String, Uuid, func
+from core.database import Base
+
+class ConversationArchive(Base):
+    """Marks a conversation whose messages were moved to the archive store"""
+    
+    __tablename__ = "conversation_archives"
+    
+    conversation_id = Column(Uuid, primary_key=True)
+    storage_key = Column(String(512), nullable=False)
+    message_count = Column(Integer, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,26 @@
+"""
+Evaluation score model
+"""
+
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, SmallInteger, String, Text, Uuid, func
+from core.database import Base
+
+class EvaluationScore(Base):
+    """One rubric criterion score for one submission"""
+    
+    __tablename__ = "evaluation_scores"
+    __table_args__ = (
+        Index("ix_evaluation_scores_rubric_submission", "rubric_id", "submission_id"),
+    )
+    
+    # SQLite only autoincrements INTEGER primary keys
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    rubric_id = Column(String(64), nullable=False)
+    submission_id = Column(String(64), nullable=False)
+    criterion = Column(String(64), nullable=False)
+    score = Column(SmallInteger, nullable=False)
+    max_score = Column(SmallInteger, nullable=False)
+    rationale = Column(Text, nullable=True)
+    model = Column(String(64), nullable=False)
+    evaluated_by = Column(Uuid, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,77 @@
+"""
+Schemas for rubric-based case-study evaluation
+"""
+
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal, Optional
+
+class RubricCriterion(BaseModel):
+    """A single scored criterion"""
+    key: str = Field(..., pattern=r"^[a-z][a-z0-9_]{0,63}$")
+    description: str
+    max_score: int = Field(10, ge=1, le=100)
+
+class Rubric(BaseModel):
+    """Scoring rubric shared by every submission it grades"""
+    id: str = Field(..., max_length=64)
+    name: str
+    instructions: Optional[str] = None
+    criteria: List[RubricCriterion] = Field(..., min_length=1, max_length=50)
+
+    @field_validator("criteria")
+    @classmethod
+    def unique_keys(cls, criteria: List[RubricCriterion]) -> List[RubricCriterion]:
+        # Keys name the properties of the structured output and the stored scores
+        keys = [criterion.key for criterion in criteria]
+        duplicates = sorted({key for key in keys if keys.count(key) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate criterion keys: {', '.join(duplicates)}")
+        return criteria
+
+class Submission(BaseModel):
+    """A student case-study submission"""
+    id: str = Field(..., max_length=64)
+    text: str = Field(..., min_length=1)
+
+class EvaluationRequest(BaseModel):
+    rubric: Rubric
+    submission: Submission
+    model: Optional[str] = None
+    # "single": one call returning every criterion; "parallel": one call per criterion
+    mode: Literal["single", "parallel"] = "single"
+
+class CohortEvaluationRequest(BaseModel):
+    rubric: Rubric
+    submissions: List[Submission] = Field(..., min_length=1, max_length=500)
+    model: Optional[str] = None
+    mode: Literal["single", "parallel"] = "single"
+
+class CriterionResult(BaseModel):
+    """Structured output for one criterion, as returned by the model"""
+    score: int
+    rationale: str
+
+class CriterionScore(BaseModel):
+    criterion: str
+    score: int
+    max_score: int
+    rationale: str
+
+class EvaluationResponse(BaseModel):
+    submission_id: str
+    rubric_id: str
+    scores: List[CriterionScore]
+    total_score: int
+    max_total_score: int
+    token_count: int
+    model: str
+
+class CohortEvaluationError(BaseModel):
+    submission_id: str
+    error: str
+
+class CohortEvaluationResponse(BaseModel):
+    rubric_id: str
+    results: List[EvaluationResponse]
+    errors: List[CohortEvaluationError]
+    token_count: int
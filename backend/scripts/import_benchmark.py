@@ -0,0 +1,134 @@
+"""
+Import-time benchmark for application modules
+
+Runs `python -X importtime -c "import <modules>"` in a clean interpreter and
+reports the total import cost plus the slowest packages each module pulls in.
+Modules imported by interpreter startup (encodings, site, ...) are excluded.
+Exits non-zero when the budget is exceeded or when a lazily loaded SDK is
+imported eagerly, so it can gate startup regressions in CI.
+
+Usage (from the backend directory):
+    python scripts/import_benchmark.py --budget-ms 1500
+    python scripts/import_benchmark.py --module core.database --module services.llm_service
+"""
+
+from typing import List, Tuple
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# SDKs that must only be imported on first use, never at module load
+LAZY_MODULES = ["openai", "anthropic", "boto3"]
+
+# (depth, module, self_us, cumulative_us), in the order importtime reports them
+ImportEntry = Tuple[int, str, int, int]
+
+def parse_importtime(output: str) -> List[ImportEntry]:
+    """Parse `-X importtime` output, keeping the nesting depth of each import"""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # importtime indents nested imports by two spaces per level
+        name = name.rstrip()[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+def import_trees(entries: List[ImportEntry]) -> List[Tuple[ImportEntry, List[ImportEntry]]]:
+    """
+    Group entries into one tree per top-level import
+
+    importtime reports a module after everything it imports, so each depth-0
+    entry closes the tree made of the nested entries listed before it.
+
+    Returns:
+        List of (root_entry, nested_entries)
+    """
+    trees = []
+    nested: List[ImportEntry] = []
+    for entry in entries:
+        if entry[0] == 0:
+            trees.append((entry, nested))
+            nested = []
+        else:
+            nested.append(entry)
+    return trees
+
+def benchmarked_trees(
+    entries: List[ImportEntry],
+    modules: List[str]
+) -> List[Tuple[ImportEntry, List[ImportEntry]]]:
+    """Trees rooted at the benchmarked modules or their parent packages"""
+    roots = set()
+    for module in modules:
+        parts = module.split(".")
+        roots.update(".".join(parts[:i]) for i in range(1, len(parts) + 1))
+    return [tree for tree in import_trees(entries) if tree[0][1] in roots]
+
+def measure_imports(modules: List[str]) -> List[ImportEntry]:
+    """Import modules in a fresh interpreter and collect import timings"""
+    env = dict(os.environ)
+    # Benchmark the unconfigured boot path: no provider keys, no lazy SDKs
+    env.pop("OPENAI_API_KEY", None)
+    env.pop("ANTHROPIC_API_KEY", None)
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {', '.join(modules)} failed:\n{result.stderr}")
+    return parse_importtime(result.stderr)
+
+def package_costs(trees: List[Tuple[ImportEntry, List[ImportEntry]]]) -> List[Tuple[str, int]]:
+    """Cumulative cost of each package imported directly by the benchmarked modules, slowest first"""
+    costs = {}
+    for _, nested in trees:
+        for depth, name, _, cumulative_us in nested:
+            if depth == 1:
+                root = name.split(".")[0]
+                costs[root] = costs.get(root, 0) + cumulative_us
+    return sorted(costs.items(), key=lambda item: item[1], reverse=True)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure application import time")
+    parser.add_argument(
+        "--module", action="append", dest="modules",
+        help="Module to import (repeatable, default: main)"
+    )
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail above this total")
+    parser.add_argument("--top", type=int, default=15, help="Number of packages to report")
+    args = parser.parse_args()
+    modules = args.modules or ["main"]
+
+    trees = benchmarked_trees(measure_imports(modules), modules)
+    total_us = sum(root[3] for root, _ in trees)
+
+    print(f"Total import time for {', '.join(modules)}: {total_us / 1000:.1f} ms")
+    print(f"{'package':<30} {'cumulative ms':>14}")
+    for name, cumulative_us in package_costs(trees)[:args.top]:
+        print(f"{name:<30} {cumulative_us / 1000:>14.1f}")
+
+    failed = False
+    loaded = {entry[1].split(".")[0] for root, nested in trees for entry in [root, *nested]}
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    if eager:
+        print(f"❌ Lazily loaded SDKs imported at startup: {', '.join(eager)}")
+        failed = True
+    if args.budget_ms is not None and total_us / 1000 > args.budget_ms:
+        print(f"❌ Import time exceeds budget of {args.budget_ms:.0f} ms")
+        failed = True
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
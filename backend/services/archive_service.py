@@ -0,0 +1,375 @@
+"""
+Archive Service - Moves cold conversations to compressed object storage
+"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from uuid import UUID, uuid4
+from sqlalchemy import delete, inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import gzip
+import json
+import logging
+import os
+
+from core.config import settings
+from core.database import AsyncSessionLocal, get_engine
+from core.db_router import db_router
+from models.archive import ConversationArchive
+from models.conversation import Conversation, Message
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant so only one worker archives at a time. Separate from the
+# partition DDL lock: archiving only deletes rows, and expired partitions are
+# dropped only once empty, so the two jobs never need to exclude each other.
+ARCHIVE_LOCK_KEY = 720_272
+
+# Bound parameters per DELETE ... IN (...) statement
+DELETE_BATCH_SIZE = 1000
+
+class ArchiveStore(ABC):
+    """Blob storage for archived conversations"""
+
+    @abstractmethod
+    async def put(self, key: str, data: bytes):
+        ...
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+class LocalArchiveStore(ArchiveStore):
+    """Local-filesystem stand-in for object storage (development, tests)"""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = os.path.abspath(root or settings.ARCHIVE_LOCAL_PATH)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid archive key: {key}")
+        return path
+
+    def _write(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _read(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def _remove(self, key: str):
+        path = self._path(key)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass  # Not empty
+
+    async def put(self, key: str, data: bytes):
+        await asyncio.to_thread(self._write, key, data)
+
+    async def get(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._read, key)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._remove, key)
+
+class S3ArchiveStore(ArchiveStore):
+    """S3-backed archive store"""
+
+    def __init__(self, bucket: Optional[str] = None, prefix: Optional[str] = None):
+        import boto3
+
+        self.bucket = bucket or settings.S3_BUCKET_NAME
+        self.prefix = settings.ARCHIVE_S3_PREFIX if prefix is None else prefix
+        self.client = boto3.client(
+            "s3",
+            region_name=settings.AWS_REGION,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID or None,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY or None,
+        )
+
+    async def put(self, key: str, data: bytes):
+        await asyncio.to_thread(
+            self.client.put_object,
+            Bucket=self.bucket,
+            Key=self.prefix + key,
+            Body=data,
+            ContentType="application/json",
+            ContentEncoding="gzip",
+        )
+
+    async def get(self, key: str) -> bytes:
+        response = await asyncio.to_thread(
+            self.client.get_object, Bucket=self.bucket, Key=self.prefix + key
+        )
+        return await asyncio.to_thread(response["Body"].read)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(
+            self.client.delete_object, Bucket=self.bucket, Key=self.prefix + key
+        )
+
+def get_archive_store() -> ArchiveStore:
+    """Create the archive store configured by ARCHIVE_BACKEND"""
+    if settings.ARCHIVE_BACKEND == "local":
+        return LocalArchiveStore()
+    if settings.ARCHIVE_BACKEND == "s3":
+        return S3ArchiveStore()
+    raise ValueError(f"Unsupported archive backend: {settings.ARCHIVE_BACKEND}")
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Cannot archive value of type {type(value).__name__}")
+
+def _message_to_row(message: Message) -> Dict[str, Any]:
+    return {attr.key: getattr(message, attr.key) for attr in inspect(Message).column_attrs}
+
+def _row_to_message(row: Dict[str, Any]) -> Message:
+    values = {}
+    for attr in inspect(Message).column_attrs:
+        if attr.key not in row:
+            continue
+        value = row[attr.key]
+        if isinstance(value, str):
+            try:
+                python_type = attr.columns[0].type.python_type
+            except NotImplementedError:
+                python_type = str
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is UUID:
+                value = UUID(value)
+        values[attr.key] = value
+    return Message(**values)
+
+class ArchiveService:
+    """Archives cold conversations and rehydrates them on read"""
+
+    def __init__(self, store: Optional[ArchiveStore] = None):
+        self.store = store or get_archive_store()
+
+    @staticmethod
+    def storage_key(conversation_id: UUID) -> str:
+        # A fresh key per write, so deleting a superseded blob can never
+        # remove the one that replaced it
+        return f"conversations/{conversation_id}/{uuid4().hex}.json.gz"
+
+    async def find_cold_conversations(
+        self,
+        db: AsyncSession,
+        older_than: datetime,
+        limit: int
+    ) -> List[UUID]:
+        """
+        Conversations whose most recent message is older than `older_than`
+
+        Driven from conversations so both checks are index probes on
+        (conversation_id, created_at) instead of an aggregate over all messages.
+        """
+        old_messages = select(Message.id).where(
+            Message.conversation_id == Conversation.id,
+            Message.created_at < older_than,
+        )
+        recent_messages = select(Message.id).where(
+            Message.conversation_id == Conversation.id,
+            Message.created_at >= older_than,
+        )
+        stmt = (
+            select(Conversation.id)
+            .where(old_messages.exists(), ~recent_messages.exists())
+            .limit(limit)
+        )
+        result = await db.execute(stmt)
+        return list(result.scalars().all())
+
+    async def _load_archived_rows(self, archive: ConversationArchive) -> List[Dict[str, Any]]:
+        data = await self.store.get(archive.storage_key)
+        return json.loads(gzip.decompress(data))["messages"]
+
+    async def archive_conversation(self, db: AsyncSession, conversation_id: UUID) -> int:
+        """
+        Move a conversation's messages to the archive store
+
+        Returns:
+            Number of messages now held in the archive
+        """
+        stmt = select(Message).where(
+            Message.conversation_id == conversation_id
+        ).order_by(Message.created_at)
+        result = await db.execute(stmt)
+        messages = result.scalars().all()
+        if not messages:
+            return 0
+
+        rows = [_message_to_row(msg) for msg in messages]
+        message_ids = [msg.id for msg in messages]
+
+        # A conversation archived before and written to since: keep both parts.
+        # The lock keeps a concurrent rehydrate from restoring the old blob mid-way.
+        archive = await db.get(
+            ConversationArchive, conversation_id, with_for_update=True, populate_existing=True
+        )
+        previous_key = None
+        if archive:
+            rows = await self._load_archived_rows(archive) + rows
+            previous_key = archive.storage_key
+
+        payload = json.dumps(
+            {"conversation_id": str(conversation_id), "messages": rows},
+            default=_encode_value,
+            separators=(",", ":"),
+        ).encode()
+        data = gzip.compress(payload)
+        key = self.storage_key(conversation_id)
+
+        # Write the blob first: if the DB step fails the rows are still live
+        await self.store.put(key, data)
+
+        if archive is None:
+            archive = ConversationArchive(conversation_id=conversation_id)
+            db.add(archive)
+        archive.storage_key = key
+        archive.message_count = len(rows)
+        archive.size_bytes = len(data)
+        archive.archived_at = datetime.now(timezone.utc)
+        # Delete only what was serialised: a turn committed after the SELECT
+        # stays live and is picked up by a later cycle
+        for i in range(0, len(message_ids), DELETE_BATCH_SIZE):
+            await db.execute(delete(Message).where(
+                Message.conversation_id == conversation_id,
+                Message.id.in_(message_ids[i:i + DELETE_BATCH_SIZE])
+            ))
+        await db.commit()
+
+        if previous_key:
+            await self.store.delete(previous_key)
+        return len(rows)
+
+    async def rehydrate(self, db: AsyncSession, conversation_id: UUID) -> bool:
+        """
+        Restore an archived conversation's messages into the messages table
+
+        Returns:
+            True if the conversation was archived and has been restored by this call
+        """
+        # Concurrent readers queue on the row lock; once the first one commits
+        # the row is gone and the others return without restoring twice
+        archive = await db.get(
+            ConversationArchive, conversation_id, with_for_update=True, populate_existing=True
+        )
+        if archive is None:
+            return False
+
+        rows = await self._load_archived_rows(archive)
+        db.add_all([_row_to_message(row) for row in rows])
+        storage_key = archive.storage_key
+        await db.delete(archive)
+        await db.commit()
+        # Replicas may not have the restored rows yet
+        await db_router.mark_write(conversation_id)
+
+        await self.store.delete(storage_key)
+        logger.info(f"Rehydrated {len(rows)} archived messages for conversation {conversation_id}")
+        return True
+
+    async def archive_cold_conversations(
+        self,
+        db: AsyncSession,
+        older_than_days: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ) -> int:
+        """
+        Archive one batch of conversations idle for `older_than_days`
+
+        Returns:
+            Number of conversations archived
+        """
+        days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        conversation_ids = await self.find_cold_conversations(
+            db, cutoff, batch_size or settings.ARCHIVE_BATCH_SIZE
+        )
+
+        archived = 0
+        for conversation_id in conversation_ids:
+            try:
+                await self.archive_conversation(db, conversation_id)
+                archived += 1
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"Error archiving conversation {conversation_id}: {e}")
+
+        if archived:
+            logger.info(f"Archived {archived} cold conversations")
+        return archived
+
+async def rehydrate_if_archived(
+    db: AsyncSession,
+    conversation_id: UUID,
+    read_db: Optional[AsyncSession] = None
+) -> bool:
+    """
+    Transparently restore a conversation before reading its messages
+
+    The archive lookup runs on `read_db` when given (e.g. a replica session);
+    the restore itself always writes through `db`.
+
+    Returns:
+        True if the conversation was archived, whether this call or a concurrent
+        one restored it; its messages must then be read from the primary
+    """
+    if await (read_db or db).get(ConversationArchive, conversation_id) is None:
+        return False
+    await ArchiveService().rehydrate(db, conversation_id)
+    return True
+
+async def run_retention_cycle():
+    """Archive one batch of cold conversations"""
+    engine = get_engine()
+    is_postgres = engine.dialect.name == "postgresql"
+
+    async with engine.connect() as lock_conn:
+        if is_postgres:
+            result = await lock_conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": ARCHIVE_LOCK_KEY}
+            )
+            if not result.scalar():
+                return  # Another worker is running the cycle
+        try:
+            async with AsyncSessionLocal() as db:
+                await ArchiveService().archive_cold_conversations(db)
+        finally:
+            if is_postgres:
+                await lock_conn.execute(
+                    text("SELECT pg_advisory_unlock(:key)"), {"key": ARCHIVE_LOCK_KEY}
+                )
+
+async def run_retention_loop():
+    """Background task: run the retention cycle every ARCHIVE_INTERVAL_SECONDS"""
+    while True:
+        try:
+            await run_retention_cycle()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in retention cycle: {e}")
+        await asyncio.sleep(settings.ARCHIVE_INTERVAL_SECONDS)
@@ -0,0 +1,46 @@
+"""
+Cache Service - Redis-backed response cache
+"""
+
+from typing import Any, Dict, Optional
+from core.config import settings
+from core.redis_client import get_redis
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """
+    Cache of generated responses
+
+    Cache failures are logged and treated as misses so an unavailable Redis
+    never fails a chat request.
+    """
+
+    def __init__(self, prefix: str = "response:"):
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = await get_redis().get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Response cache read failed: {e}")
+            return None
+        return json.loads(value) if value else None
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: Optional[int] = None):
+        try:
+            await get_redis().set(
+                self.prefix + key, json.dumps(value), ex=ttl or settings.REDIS_CACHE_TTL
+            )
+        except Exception as e:
+            logger.warning(f"Response cache write failed: {e}")
+
+    async def delete(self, key: str):
+        try:
+            await get_redis().delete(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Response cache delete failed: {e}")
+
+response_cache = ResponseCache()
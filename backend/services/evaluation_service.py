@@ -0,0 +1,247 @@
+"""
+Evaluation Service - Structured rubric scoring of student case studies
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import logging
+
+from core.config import settings
+from models.evaluation import EvaluationScore
+from schemas.evaluation import (
+    CohortEvaluationError, CohortEvaluationResponse, CriterionResult,
+    CriterionScore, EvaluationResponse, Rubric, RubricCriterion, Submission
+)
+from services.llm_service import LLMService
+
+logger = logging.getLogger(__name__)
+
+GRADER_PROMPT = (
+    "You are an impartial grader of student case studies. Score the submission "
+    "strictly against the rubric. Give each criterion an integer score between 0 "
+    "and its maximum and a rationale of at most three sentences that cites the "
+    "submission."
+)
+
+_CRITERION_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "integer"},
+        "rationale": {"type": "string"}
+    },
+    "required": ["score", "rationale"],
+    "additionalProperties": False
+}
+
+_all_criteria_adapter = TypeAdapter(Dict[str, CriterionResult])
+
+def _rubric_block(rubric: Rubric) -> str:
+    lines = [f"Rubric: {rubric.name}"]
+    if rubric.instructions:
+        lines.append(rubric.instructions)
+    for criterion in rubric.criteria:
+        lines.append(f"- {criterion.key} (0-{criterion.max_score}): {criterion.description}")
+    return "\n".join(lines)
+
+def _submission_block(submission: Submission) -> str:
+    return f"Submission {submission.id}:\n<submission>\n{submission.text}\n</submission>"
+
+def _all_criteria_schema(rubric: Rubric) -> Dict[str, Any]:
+    keys = [criterion.key for criterion in rubric.criteria]
+    return {
+        "type": "object",
+        "properties": {key: _CRITERION_SCHEMA for key in keys},
+        "required": keys,
+        "additionalProperties": False
+    }
+
+def _to_score(criterion: RubricCriterion, result: CriterionResult) -> CriterionScore:
+    if not 0 <= result.score <= criterion.max_score:
+        raise ValueError(
+            f"Score {result.score} for '{criterion.key}' is outside 0-{criterion.max_score}"
+        )
+    return CriterionScore(
+        criterion=criterion.key,
+        score=result.score,
+        max_score=criterion.max_score,
+        rationale=result.rationale
+    )
+
+class EvaluationService:
+    """
+    Scores submissions against a rubric with structured (JSON schema) output
+
+    The rubric and submission are sent as a fixed system prefix, rubric first,
+    so every call for a submission, and the rubric part across a cohort, can
+    be served from the provider's prompt cache. "single" mode scores all
+    criteria in one call; "parallel" mode runs one call per criterion over
+    the same prefix.
+
+    A prefix is only cached once a call using it has completed, so the first
+    call for a submission (and the first submission of a cohort) runs alone
+    before the rest are sent concurrently. All calls made by one service
+    share EVALUATION_MAX_CONCURRENCY slots.
+    """
+
+    def __init__(self, llm_service: Optional[LLMService] = None):
+        self.llm_service = llm_service or LLMService()
+        self._call_slots = asyncio.Semaphore(settings.EVALUATION_MAX_CONCURRENCY)
+
+    async def _structured_call(
+        self,
+        prefix: List[str],
+        instruction: str,
+        schema: Dict[str, Any],
+        schema_name: str,
+        model: str,
+        parse
+    ) -> Tuple[Any, int]:
+        """Run a structured call, retrying when the output fails validation"""
+        tokens = 0
+        for attempt in range(settings.EVALUATION_MAX_RETRIES + 1):
+            async with self._call_slots:
+                raw, used = await self.llm_service.generate_structured(
+                    prefix=prefix,
+                    instruction=instruction,
+                    schema=schema,
+                    schema_name=schema_name,
+                    model=model,
+                    max_tokens=settings.EVALUATION_MAX_TOKENS
+                )
+            tokens += used
+            try:
+                return parse(raw), tokens
+            except (ValidationError, ValueError, KeyError) as e:
+                if attempt == settings.EVALUATION_MAX_RETRIES:
+                    raise ValueError(f"Invalid structured output: {e}")
+                logger.warning(f"Retrying structured evaluation after invalid output: {e}")
+
+    async def evaluate(
+        self,
+        rubric: Rubric,
+        submission: Submission,
+        model: Optional[str] = None,
+        mode: str = "single"
+    ) -> EvaluationResponse:
+        """Score one submission against every rubric criterion"""
+        model = model or settings.EVALUATION_MODEL or self.llm_service.default_model
+        prefix = [f"{GRADER_PROMPT}\n\n{_rubric_block(rubric)}", _submission_block(submission)]
+
+        if mode == "single":
+            def parse_all(raw: str) -> List[CriterionScore]:
+                results = _all_criteria_adapter.validate_json(raw)
+                return [_to_score(c, results[c.key]) for c in rubric.criteria]
+
+            scores, token_count = await self._structured_call(
+                prefix,
+                "Score every rubric criterion.",
+                _all_criteria_schema(rubric),
+                "rubric_scores",
+                model,
+                parse_all
+            )
+        elif mode == "parallel":
+            async def score_criterion(criterion: RubricCriterion) -> Tuple[CriterionScore, int]:
+                return await self._structured_call(
+                    prefix,
+                    f"Score only the criterion '{criterion.key}'.",
+                    _CRITERION_SCHEMA,
+                    "criterion_score",
+                    model,
+                    lambda raw: _to_score(criterion, CriterionResult.model_validate_json(raw))
+                )
+
+            # The first call writes the prefix to the cache; the rest read it
+            first, *rest = rubric.criteria
+            results = [await score_criterion(first)]
+            results += await asyncio.gather(*(score_criterion(c) for c in rest))
+            scores = [score for score, _ in results]
+            token_count = sum(tokens for _, tokens in results)
+        else:
+            raise ValueError(f"Unsupported evaluation mode: {mode}")
+
+        return EvaluationResponse(
+            submission_id=submission.id,
+            rubric_id=rubric.id,
+            scores=scores,
+            total_score=sum(score.score for score in scores),
+            max_total_score=sum(criterion.max_score for criterion in rubric.criteria),
+            token_count=token_count,
+            model=model
+        )
+
+    async def evaluate_cohort(
+        self,
+        rubric: Rubric,
+        submissions: List[Submission],
+        model: Optional[str] = None,
+        mode: str = "single"
+    ) -> CohortEvaluationResponse:
+        """Score many submissions concurrently; failures are reported per submission"""
+        async def evaluate_one(submission: Submission):
+            try:
+                return await self.evaluate(rubric, submission, model=model, mode=mode)
+            except Exception as e:
+                logger.error(f"Error evaluating submission {submission.id}: {e}")
+                return CohortEvaluationError(submission_id=submission.id, error=str(e))
+
+        # The first submission writes the shared rubric block to the cache
+        first, *rest = submissions
+        outcomes = [await evaluate_one(first)]
+        outcomes += await asyncio.gather(*(evaluate_one(s) for s in rest))
+        results = [o for o in outcomes if isinstance(o, EvaluationResponse)]
+
+        return CohortEvaluationResponse(
+            rubric_id=rubric.id,
+            results=results,
+            errors=[o for o in outcomes if isinstance(o, CohortEvaluationError)],
+            token_count=sum(result.token_count for result in results)
+        )
+
+    async def save_scores(
+        self,
+        db: AsyncSession,
+        results: List[EvaluationResponse],
+        evaluated_by=None
+    ):
+        """Persist scores, replacing the evaluator's earlier scores for the same submission"""
+        for result in results:
+            await db.execute(delete(EvaluationScore).where(
+                EvaluationScore.rubric_id == result.rubric_id,
+                EvaluationScore.submission_id == result.submission_id,
+                EvaluationScore.evaluated_by == evaluated_by
+            ))
+            db.add_all([
+                EvaluationScore(
+                    rubric_id=result.rubric_id,
+                    submission_id=result.submission_id,
+                    criterion=score.criterion,
+                    score=score.score,
+                    max_score=score.max_score,
+                    rationale=score.rationale,
+                    model=result.model,
+                    evaluated_by=evaluated_by
+                )
+                for score in result.scores
+            ])
+        await db.commit()
+
+    async def get_scores(
+        self,
+        db: AsyncSession,
+        rubric_id: str,
+        submission_id: str,
+        evaluated_by=None
+    ) -> List[EvaluationScore]:
+        stmt = select(EvaluationScore).where(
+            EvaluationScore.rubric_id == rubric_id,
+            EvaluationScore.submission_id == submission_id
+        )
+        if evaluated_by is not None:
+            stmt = stmt.where(EvaluationScore.evaluated_by == evaluated_by)
+        stmt = stmt.order_by(EvaluationScore.id)
+        result = await db.execute(stmt)
+        return list(result.scalars().all())
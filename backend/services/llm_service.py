@@ -2,23 +2,111 @@
 LLM Service - Handles interactions with various LLM providers
 """
 
-from typing import List, Dict, Optional, AsyncGenerator
-import openai
-from anthropic import AsyncAnthropic
-import asyncio
+from typing import List, Dict, Optional, AsyncGenerator, Any
 from core.config import settings
+import asyncio
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Provider clients are created on first use and shared by every LLMService
+# instance, so the SDKs (and their HTTP connection pools) are only loaded for
+# providers that actually have an API key configured.
+_clients: Dict[str, Any] = {}
+
+# Upper bound on how long a slow provider can delay startup
+WARMUP_TIMEOUT_SECONDS = 5.0
+
+def configured_providers() -> List[str]:
+    """Return the providers that have an API key configured"""
+    providers = []
+    if settings.OPENAI_API_KEY:
+        providers.append("openai")
+    if settings.ANTHROPIC_API_KEY:
+        providers.append("anthropic")
+    return providers
+
+def get_openai_client():
+    """Get the shared OpenAI client, importing the SDK on first use"""
+    client = _clients.get("openai")
+    if client is None:
+        if not settings.OPENAI_API_KEY:
+            raise ValueError("OpenAI provider is not configured (OPENAI_API_KEY is empty)")
+        import openai
+        client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        _clients["openai"] = client
+    return client
+
+def get_anthropic_client():
+    """Get the shared Anthropic client, importing the SDK on first use"""
+    client = _clients.get("anthropic")
+    if client is None:
+        if not settings.ANTHROPIC_API_KEY:
+            raise ValueError("Anthropic provider is not configured (ANTHROPIC_API_KEY is empty)")
+        from anthropic import AsyncAnthropic
+        client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+        _clients["anthropic"] = client
+    return client
+
+async def warmup_llm_clients() -> List[str]:
+    """
+    Open a connection to every configured provider ahead of the first request
+
+    Sends one cheap, token-free request (listing models) per provider
+    so the TLS handshake and the HTTP pool are ready before user traffic
+    arrives. Failures are logged and never block startup.
+
+    Returns:
+        Providers whose warmup request succeeded
+    """
+    # Copies share the original client's connection pool
+    requests = {
+        "openai": lambda: get_openai_client().with_options(
+            max_retries=0, timeout=WARMUP_TIMEOUT_SECONDS
+        ).models.list(),
+        "anthropic": lambda: get_anthropic_client().with_options(
+            max_retries=0, timeout=WARMUP_TIMEOUT_SECONDS
+        ).models.list(limit=1),
+    }
+
+    async def warm(provider: str) -> bool:
+        try:
+            await requests[provider]()
+            return True
+        except Exception as e:
+            logger.warning(f"LLM warmup request to {provider} failed: {e}")
+            return False
+
+    providers = configured_providers()
+    results = await asyncio.gather(*(warm(provider) for provider in providers))
+    warmed = [provider for provider, ok in zip(providers, results) if ok]
+    logger.info(f"LLM connections warmed up: {', '.join(warmed) or 'none'}")
+    return warmed
+
+async def close_llm_clients():
+    """Close shared provider clients and their HTTP connection pools"""
+    for provider, client in list(_clients.items()):
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning(f"Error closing {provider} client: {e}")
+    _clients.clear()
+
 class LLMService:
     """Service for interacting with Large Language Models"""
     
     def __init__(self):
-        self.openai_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-        self.anthropic_client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
         self.default_model = settings.OPENAI_MODEL
     
+    @property
+    def openai_client(self):
+        return get_openai_client()
+    
+    @property
+    def anthropic_client(self):
+        return get_anthropic_client()
+    
     async def generate_response(
         self,
         message: str,
@@ -91,6 +179,53 @@ class LLMService:
             logger.error(f"Error streaming response: {e}")
             raise
     
+    async def generate_structured(
+        self,
+        prefix: List[str],
+        instruction: str,
+        schema: Dict[str, Any],
+        schema_name: str,
+        model: Optional[str] = None,
+        temperature: float = 0.0,
+        max_tokens: int = 1024
+    ) -> tuple[str, int]:
+        """
+        Generate a JSON response that conforms to a JSON schema
+        
+        The prefix blocks form the system prompt and are kept byte-identical
+        across calls so providers can serve them from their prompt cache;
+        only the instruction varies per call.
+        
+        Args:
+            prefix: System prompt blocks, most widely shared first
+            instruction: Per-call user instruction
+            schema: JSON schema the response must follow
+            schema_name: Name for the schema/tool
+            model: Model to use (defaults to configured model)
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens in response
+            
+        Returns:
+            Tuple of (json_text, token_count)
+        """
+        try:
+            model = model or self.default_model
+            
+            if model.startswith("gpt"):
+                return await self._structured_openai(
+                    prefix, instruction, schema, schema_name, model, temperature, max_tokens
+                )
+            elif model.startswith("claude"):
+                return await self._structured_anthropic(
+                    prefix, instruction, schema, schema_name, model, temperature, max_tokens
+                )
+            else:
+                raise ValueError(f"Unsupported model: {model}")
+                
+        except Exception as e:
+            logger.error(f"Error generating structured response: {e}")
+            raise
+    
     def _build_messages(
         self,
         message: str,
@@ -156,9 +291,12 @@ class LLMService:
                 stream=True
             )
             
-            async for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+            # Closing the stream releases the HTTP response when the consumer
+            # stops early (e.g. a cancelled WebSocket stream)
+            async with stream:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
                     
         except Exception as e:
             logger.error(f"OpenAI streaming error: {e}")
@@ -218,3 +356,85 @@ class LLMService:
         except Exception as e:
             logger.error(f"Anthropic streaming error: {e}")
             raise
+    
+    async def _structured_openai(
+        self,
+        prefix: List[str],
+        instruction: str,
+        schema: Dict[str, Any],
+        schema_name: str,
+        model: str,
+        temperature: float,
+        max_tokens: int
+    ) -> tuple[str, int]:
+        """Structured output using OpenAI (prefix caching is automatic)"""
+        try:
+            response = await self.openai_client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": "\n\n".join(prefix)},
+                    {"role": "user", "content": instruction}
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                response_format={
+                    "type": "json_schema",
+                    "json_schema": {"name": schema_name, "schema": schema, "strict": True}
+                }
+            )
+            
+            content = response.choices[0].message.content
+            tokens = response.usage.total_tokens
+            
+            return content, tokens
+            
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}")
+            raise
+    
+    async def _structured_anthropic(
+        self,
+        prefix: List[str],
+        instruction: str,
+        schema: Dict[str, Any],
+        schema_name: str,
+        model: str,
+        temperature: float,
+        max_tokens: int
+    ) -> tuple[str, int]:
+        """Structured output using Anthropic Claude via a forced tool call"""
+        try:
+            # Cache breakpoint after each prefix block so shared blocks are
+            # reused even when later ones differ
+            system = [
+                {"type": "text", "text": block, "cache_control": {"type": "ephemeral"}}
+                for block in prefix
+            ]
+            
+            response = await self.anthropic_client.messages.create(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                system=system,
+                messages=[{"role": "user", "content": instruction}],
+                tools=[{
+                    "name": schema_name,
+                    "description": "Record the evaluation result",
+                    "input_schema": schema
+                }],
+                tool_choice={"type": "tool", "name": schema_name}
+            )
+            
+            tool_use = next(block for block in response.content if block.type == "tool_use")
+            usage = response.usage
+            tokens = (
+                usage.input_tokens + usage.output_tokens
+                + (getattr(usage, "cache_creation_input_tokens", None) or 0)
+                + (getattr(usage, "cache_read_input_tokens", None) or 0)
+            )
+            
+            return json.dumps(tool_use.input), tokens
+            
+        except Exception as e:
+            logger.error(f"Anthropic API error: {e}")
+            raise
@@ -0,0 +1,323 @@
+"""
+Speculative Service - Precomputes responses to predictable follow-up prompts
+"""
+
+from typing import Dict, List, Optional, Set, Tuple
+from core.config import settings
+from core.redis_client import get_redis
+from services.cache_service import ResponseCache
+from services.llm_service import LLMService
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# Rough prompt-size estimate used to reserve budget before a call
+CHARS_PER_TOKEN = 4
+TOKENS_PER_MESSAGE = 4
+
+def normalize_prompt(prompt: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a prompt"""
+    return re.sub(r"\s+", " ", prompt).strip().rstrip(".!?").lower()
+
+def get_tenant_id(user) -> str:
+    return str(getattr(user, "tenant_id", None) or "default")
+
+class SpeculativeStats:
+    """Per-tenant speculation counters"""
+
+    FIELDS = (
+        "scheduled", "completed", "hits", "misses", "skipped_budget",
+        "skipped_capacity", "tokens_spent", "tokens_served",
+    )
+
+    def __init__(self, counters: Optional[Dict[str, str]] = None):
+        counters = counters or {}
+        for field in self.FIELDS:
+            setattr(self, field, int(counters.get(field, 0)))
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.completed if self.completed else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "scheduled": self.scheduled,
+            "completed": self.completed,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+            "skipped_budget": self.skipped_budget,
+            "skipped_capacity": self.skipped_capacity,
+            "tokens_spent": self.tokens_spent,
+            "tokens_served": self.tokens_served,
+        }
+
+def _generated_nothing(error: Exception) -> bool:
+    """
+    Whether a failed LLM call was rejected before generating any tokens
+
+    ValueError is raised before a request is sent (e.g. an unsupported model);
+    provider error statuses carry a status_code and are not billed. Anything
+    else, such as a timeout, may have failed after the request was sent.
+    """
+    return isinstance(error, ValueError) or getattr(error, "status_code", None) is not None
+
+class SpeculativeEngine:
+    """
+    Speculative prefetch of configured follow-up prompts
+
+    After an assistant message is saved, the tenant's follow-up templates are
+    generated in the background and cached under a key derived from the
+    conversation history they were computed from. When the user then sends one
+    of those prompts on an unchanged conversation, the cached response is
+    served instead of calling the LLM.
+
+    Speculation is capped by a per-worker concurrency limit (extra work is
+    dropped, never queued), a per-tenant hourly token budget, and a minimum hit
+    rate below which the tenant is paused for SPECULATIVE_COOLDOWN_SECONDS.
+    The budget, counters and pauses are kept in Redis so they apply across all
+    workers; when Redis is unavailable nothing is speculated.
+    """
+
+    def __init__(self, cache: Optional[ResponseCache] = None, prefix: str = "speculative:"):
+        self.cache = cache or ResponseCache(prefix=prefix)
+        self.prefix = prefix
+        self._in_flight = 0
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _key(self, kind: str, tenant_id: str) -> str:
+        return f"{self.prefix}{kind}:{tenant_id}"
+
+    def _budget_key(self, tenant_id: str) -> str:
+        return f"{self._key('budget', tenant_id)}:{int(time.time() // 3600)}"
+
+    async def stats(self, tenant_id: str) -> SpeculativeStats:
+        try:
+            counters = await get_redis().hgetall(self._key("stats", tenant_id))
+        except Exception as e:
+            logger.warning(f"Failed to read speculation stats: {e}")
+            counters = {}
+        return SpeculativeStats(counters)
+
+    async def _count(self, tenant_id: str, template: Optional[str] = None, **counters: int):
+        """Add to the tenant's counters (and a template's hit count); failures are only logged"""
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for field, amount in counters.items():
+                    pipe.hincrby(self._key("stats", tenant_id), field, amount)
+                if template is not None:
+                    pipe.hincrby(self._key("template_hits", tenant_id), template, 1)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to update speculation stats: {e}")
+
+    def followups(self, tenant_id: str) -> List[str]:
+        templates = settings.SPECULATIVE_FOLLOWUPS
+        return templates.get(tenant_id) or templates.get("default", [])
+
+    def is_predicted(self, tenant_id: str, prompt: str) -> bool:
+        """Whether `prompt` is one of the tenant's follow-up templates"""
+        if not settings.SPECULATIVE_ENABLED:
+            return False
+        normalized = normalize_prompt(prompt)
+        return any(normalize_prompt(t) == normalized for t in self.followups(tenant_id))
+
+    @staticmethod
+    def cache_key(conversation_id, model: str, prompt: str, history: List[Dict[str, str]]) -> str:
+        digest = hashlib.sha256(
+            json.dumps([model, normalize_prompt(prompt), history], separators=(",", ":")).encode()
+        ).hexdigest()
+        return f"{conversation_id}:{digest}"
+
+    @staticmethod
+    def estimate_tokens(template: str, history: List[Dict[str, str]]) -> int:
+        """Tokens to reserve for one speculative call: the whole prompt plus the output cap"""
+        messages = LLMService()._build_messages(template, history)
+        prompt_chars = sum(len(message["content"]) for message in messages)
+        prompt_tokens = prompt_chars // CHARS_PER_TOKEN + TOKENS_PER_MESSAGE * len(messages)
+        return prompt_tokens + settings.SPECULATIVE_MAX_TOKENS
+
+    async def lookup(
+        self,
+        tenant_id: str,
+        conversation_id,
+        model: str,
+        prompt: str,
+        history: List[Dict[str, str]]
+    ) -> Optional[Tuple[str, int]]:
+        """
+        Get a precomputed response for a predicted prompt
+
+        Args:
+            history: Conversation history before the prompt was saved
+
+        Returns:
+            Tuple of (response_text, token_count), or None on a miss
+        """
+        cached = await self.cache.get(self.cache_key(conversation_id, model, prompt, history))
+        if cached is None:
+            await self._count(tenant_id, misses=1)
+            return None
+
+        await self._count(
+            tenant_id,
+            template=normalize_prompt(prompt),
+            hits=1,
+            tokens_served=cached["token_count"]
+        )
+        return cached["content"], cached["token_count"]
+
+    async def _pays_off(self, tenant_id: str) -> bool:
+        redis = get_redis()
+        if await redis.exists(self._key("paused", tenant_id)):
+            return False
+
+        stats = await self.stats(tenant_id)
+        if stats.completed >= settings.SPECULATIVE_MIN_SAMPLES:
+            if stats.hit_rate < settings.SPECULATIVE_MIN_HIT_RATE:
+                logger.info(
+                    f"Pausing speculation for tenant {tenant_id}: "
+                    f"hit rate {stats.hit_rate:.2%} over {stats.completed} predictions"
+                )
+                async with redis.pipeline(transaction=False) as pipe:
+                    pipe.set(self._key("paused", tenant_id), 1, ex=settings.SPECULATIVE_COOLDOWN_SECONDS)
+                    # Start a fresh sample when the cooldown ends
+                    pipe.delete(self._key("stats", tenant_id), self._key("template_hits", tenant_id))
+                    await pipe.execute()
+                return False
+        return True
+
+    async def _reserve_budget(self, budget_key: str, tokens: int) -> bool:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.incrby(budget_key, tokens)
+            pipe.expire(budget_key, 7200)
+            used, _ = await pipe.execute()
+        if used > settings.SPECULATIVE_TOKEN_BUDGET_PER_HOUR:
+            await get_redis().decrby(budget_key, tokens)
+            return False
+        return True
+
+    async def _settle_budget(self, budget_key: str, reserved: int, spent: int):
+        if spent != reserved:
+            await get_redis().incrby(budget_key, spent - reserved)
+
+    def schedule(
+        self,
+        tenant_id: str,
+        conversation_id,
+        model: str,
+        history: List[Dict[str, str]]
+    ):
+        """
+        Start background generation of the tenant's follow-ups
+
+        Args:
+            history: Conversation history ending with the saved assistant message
+        """
+        if not settings.SPECULATIVE_ENABLED:
+            return
+        self._track(asyncio.create_task(
+            self._schedule(tenant_id, conversation_id, model, list(history))
+        ))
+
+    def _track(self, task: asyncio.Task):
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _schedule(
+        self,
+        tenant_id: str,
+        conversation_id,
+        model: str,
+        history: List[Dict[str, str]]
+    ):
+        try:
+            if not await self._pays_off(tenant_id):
+                return
+            template_hits = await get_redis().hgetall(self._key("template_hits", tenant_id))
+        except Exception as e:
+            logger.warning(f"Skipping speculation, state unavailable: {e}")
+            return
+
+        # Try the follow-ups that have paid off most often first
+        templates = sorted(
+            self.followups(tenant_id),
+            key=lambda t: int(template_hits.get(normalize_prompt(t), 0)),
+            reverse=True
+        )[:settings.SPECULATIVE_MAX_PER_TURN]
+
+        for template in templates:
+            if self._in_flight >= settings.SPECULATIVE_MAX_CONCURRENCY:
+                await self._count(tenant_id, skipped_capacity=1)
+                continue
+            # Claim the slot before awaiting Redis so concurrent turns can't overshoot
+            self._in_flight += 1
+            reserved = self.estimate_tokens(template, history)
+            budget_key = self._budget_key(tenant_id)
+            try:
+                has_budget = await self._reserve_budget(budget_key, reserved)
+            except Exception as e:
+                self._in_flight -= 1
+                logger.warning(f"Skipping speculation, budget unavailable: {e}")
+                return
+            if not has_budget:
+                self._in_flight -= 1
+                await self._count(tenant_id, skipped_budget=1)
+                continue
+
+            await self._count(tenant_id, scheduled=1)
+            self._track(asyncio.create_task(self._precompute(
+                tenant_id, conversation_id, model, template, history, budget_key, reserved
+            )))
+
+    async def _precompute(
+        self,
+        tenant_id: str,
+        conversation_id,
+        model: str,
+        template: str,
+        history: List[Dict[str, str]],
+        budget_key: str,
+        reserved: int
+    ):
+        # Until the outcome is known the provider may have billed the whole call
+        spent = reserved
+        try:
+            response_text, spent = await LLMService().generate_response(
+                message=template,
+                history=history,
+                model=model,
+                max_tokens=settings.SPECULATIVE_MAX_TOKENS
+            )
+            await self.cache.set(
+                self.cache_key(conversation_id, model, template, history),
+                {"content": response_text, "token_count": spent},
+                ttl=settings.SPECULATIVE_CACHE_TTL_SECONDS
+            )
+            await self._count(tenant_id, completed=1, tokens_spent=spent)
+        except asyncio.CancelledError:
+            # The request may already be generating upstream: keep the reservation
+            raise
+        except Exception as e:
+            logger.warning(f"Speculative generation failed: {e}")
+            if _generated_nothing(e):
+                spent = 0
+        finally:
+            self._in_flight -= 1
+            try:
+                await self._settle_budget(budget_key, reserved, spent)
+            except Exception as e:
+                logger.warning(f"Failed to settle speculation budget: {e}")
+
+    async def close(self):
+        """Cancel outstanding speculative generations"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+speculative_engine = SpeculativeEngine()
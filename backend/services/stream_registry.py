@@ -0,0 +1,300 @@
+"""
+Stream Registry - Buffers in-flight chat streams in Redis so clients can resume them
+"""
+
+from typing import Any, AsyncIterator, Coroutine, Dict, Optional, Set
+from core.config import settings
+from core.redis_client import get_redis
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+STREAM_PREFIX = "stream:"
+# Cancel requests for streams generated by another worker
+CANCEL_CHANNEL = "stream:cancel"
+# How long a reader waits on Redis before re-checking that the stream still exists
+READ_BLOCK_MS = 5000
+
+class StreamBuffer:
+    """
+    Events produced by one generation, stored in a Redis stream
+
+    Any worker can read a buffer from any offset, so a client that reconnects
+    to a different worker resumes where it left off. Offsets are chunk
+    indexes: a client that has received N chunks resumes with offset N. The
+    buffer ends with one ``done`` or ``error`` event.
+
+    Only the worker running the generation writes to the buffer. The buffer
+    stays readable for STREAM_BUFFER_TTL_SECONDS after its last write.
+
+    While the generation runs the stream is also listed in its owner's live
+    set, which caps running generations per user across connections and
+    workers. Each write renews the entry's lease, so entries left behind by a
+    worker that died expire after STREAM_BUFFER_TTL_SECONDS.
+    """
+
+    def __init__(self, stream_id: str, user_id: str):
+        self.stream_id = stream_id
+        self.user_id = user_id
+        self.conversation_id: Optional[str] = None
+        self.finished = False
+
+    @property
+    def events_key(self) -> str:
+        return f"{STREAM_PREFIX}{self.stream_id}:events"
+
+    @property
+    def meta_key(self) -> str:
+        return f"{STREAM_PREFIX}{self.stream_id}:meta"
+
+    @property
+    def live_key(self) -> str:
+        """Sorted set of the owner's running generations, scored by lease expiry"""
+        return f"{STREAM_PREFIX}user:{self.user_id}:live"
+
+    async def _write(self, event: Dict[str, str]):
+        ttl = settings.STREAM_BUFFER_TTL_SECONDS
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.xadd(self.events_key, event)
+            pipe.expire(self.events_key, ttl)
+            pipe.expire(self.meta_key, ttl)
+            # Renew the live lease; xx so a released stream is not re-added
+            pipe.zadd(self.live_key, {self.stream_id: time.time() + ttl}, xx=True)
+            pipe.expire(self.live_key, ttl)
+            await pipe.execute()
+
+    async def append(self, chunk: str):
+        await self._write({"type": "chunk", "chunk": chunk})
+
+    async def finish(self, message_id: Optional[str] = None, error: Optional[str] = None):
+        """Write the terminal event; later calls are ignored"""
+        if self.finished:
+            return
+        self.finished = True
+        if error is not None:
+            event = {"type": "error", "error": error}
+        else:
+            event = {
+                "type": "done",
+                "conversation_id": self.conversation_id or "",
+                "message_id": message_id or "",
+            }
+        await get_redis().hset(self.meta_key, "done", 1)
+        await self._write(event)
+
+    async def read_from(self, offset: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield events from chunk `offset` until the stream ends
+
+        Yields ``{"type": "chunk", "offset", "chunk"}`` events followed by one
+        ``{"type": "done", "conversation_id", "message_id"}`` or
+        ``{"type": "error", "error"}`` event.
+        """
+        redis = get_redis()
+        last_id = "0-0"
+        index = 0
+        while True:
+            response = await redis.xread({self.events_key: last_id}, count=100, block=READ_BLOCK_MS)
+            if not response:
+                if not await redis.exists(self.meta_key):
+                    yield {"type": "error", "error": "Stream expired"}
+                    return
+                continue
+
+            for entry_id, fields in response[0][1]:
+                last_id = entry_id
+                if fields["type"] == "chunk":
+                    if index >= offset:
+                        yield {"type": "chunk", "offset": index, "chunk": fields["chunk"]}
+                    index += 1
+                elif fields["type"] == "done":
+                    yield {
+                        "type": "done",
+                        "conversation_id": fields.get("conversation_id") or None,
+                        "message_id": fields.get("message_id") or None,
+                    }
+                    return
+                else:
+                    yield {"type": "error", "error": fields.get("error", "Stream failed")}
+                    return
+
+    async def attach(self):
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.hincrby(self.meta_key, "readers", 1)
+            pipe.expire(self.meta_key, settings.STREAM_BUFFER_TTL_SECONDS)
+            await pipe.execute()
+
+    async def detach(self):
+        """Stop reading; cancel the generation if nobody resumes it within the grace period"""
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.hincrby(self.meta_key, "readers", -1)
+            pipe.hget(self.meta_key, "done")
+            pipe.expire(self.meta_key, settings.STREAM_BUFFER_TTL_SECONDS)
+            readers, done, _ = await pipe.execute()
+        if readers > 0 or done:
+            return
+        stream_registry.cancel_if_orphaned(self, settings.STREAM_RESUME_GRACE_SECONDS)
+
+class StreamRegistry:
+    """
+    Registry of resumable streams, keyed by stream ID
+
+    Buffers live in Redis and are shared by all workers; generation tasks run
+    in the worker that started them. Cancel requests for a generation running
+    elsewhere are published on CANCEL_CHANNEL, which every worker that runs
+    generations listens to.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._cancel_reasons: Dict[str, str] = {}
+        self._background: Set[asyncio.Task] = set()
+        self._listener: Optional[asyncio.Task] = None
+
+    async def create(self, user_id: str) -> Optional[StreamBuffer]:
+        """
+        Register a new stream for `user_id`
+
+        Returns:
+            The buffer, or None if the user already has STREAM_MAX_LIVE_PER_USER
+            generations running
+        """
+        buffer = StreamBuffer(uuid.uuid4().hex, str(user_id))
+        ttl = settings.STREAM_BUFFER_TTL_SECONDS
+        now = time.time()
+        # Claim a slot, then check the count: concurrent creates may both be
+        # refused at the limit, but never both admitted over it
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(buffer.live_key, "-inf", now)
+            pipe.zadd(buffer.live_key, {buffer.stream_id: now + ttl})
+            pipe.zcard(buffer.live_key)
+            pipe.expire(buffer.live_key, ttl)
+            _, _, live, _ = await pipe.execute()
+        if live > settings.STREAM_MAX_LIVE_PER_USER:
+            await self._release(buffer)
+            return None
+
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.hset(buffer.meta_key, mapping={"user_id": buffer.user_id, "readers": 0})
+            pipe.expire(buffer.meta_key, ttl)
+            await pipe.execute()
+        return buffer
+
+    async def _release(self, buffer: StreamBuffer):
+        await get_redis().zrem(buffer.live_key, buffer.stream_id)
+
+    async def get(self, stream_id: str, user_id: str) -> Optional[StreamBuffer]:
+        """Look up a stream owned by `user_id`"""
+        buffer = StreamBuffer(stream_id, str(user_id))
+        owner = await get_redis().hget(buffer.meta_key, "user_id")
+        if owner is None or owner != buffer.user_id:
+            return None
+        return buffer
+
+    def start(self, buffer: StreamBuffer, coro: Coroutine) -> asyncio.Task:
+        """Run the generation for `buffer` in this worker"""
+        self._ensure_listener()
+        task = asyncio.create_task(self._run(buffer, coro))
+        self._tasks[buffer.stream_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(buffer.stream_id, None))
+        return task
+
+    async def _run(self, buffer: StreamBuffer, coro: Coroutine):
+        error = "Stream ended unexpectedly"
+        try:
+            await coro
+        except asyncio.CancelledError:
+            error = self._cancel_reasons.pop(buffer.stream_id, "Stream cancelled")
+            raise
+        finally:
+            # Make sure readers always see a terminal event
+            if not buffer.finished:
+                try:
+                    await buffer.finish(error=error)
+                except Exception as e:
+                    logger.error(f"Failed to finish stream {buffer.stream_id}: {e}")
+            try:
+                await self._release(buffer)
+            except Exception as e:
+                # The lease lapses on its own after STREAM_BUFFER_TTL_SECONDS
+                logger.warning(f"Failed to release stream {buffer.stream_id}: {e}")
+
+    def _cancel_local(self, stream_id: str, reason: str) -> bool:
+        task = self._tasks.get(stream_id)
+        if task is None or task.done():
+            return False
+        self._cancel_reasons[stream_id] = reason
+        task.cancel()
+        return True
+
+    async def cancel(self, stream_id: str, reason: str = "Stream cancelled"):
+        """Stop a generation, wherever it is running"""
+        if self._cancel_local(stream_id, reason):
+            return
+        try:
+            await get_redis().publish(
+                CANCEL_CHANNEL, json.dumps({"stream_id": stream_id, "reason": reason})
+            )
+        except Exception as e:
+            logger.warning(f"Failed to publish cancel for stream {stream_id}: {e}")
+
+    def cancel_if_orphaned(self, buffer: StreamBuffer, grace: float):
+        """Cancel `buffer`'s generation unless a reader attaches within `grace` seconds"""
+        task = asyncio.create_task(self._cancel_if_orphaned(buffer, grace))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _cancel_if_orphaned(self, buffer: StreamBuffer, grace: float):
+        if grace > 0:
+            await asyncio.sleep(grace)
+        try:
+            readers, done = await get_redis().hmget(buffer.meta_key, ["readers", "done"])
+        except Exception as e:
+            logger.warning(f"Orphan check failed for stream {buffer.stream_id}: {e}")
+            return
+        if done or readers is None or int(readers) > 0:
+            return
+        reason = "Client disconnected" if grace <= 0 else "Client did not resume"
+        await self.cancel(buffer.stream_id, reason)
+
+    def _ensure_listener(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        """Apply cancel requests published by other workers"""
+        while True:
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.subscribe(CANCEL_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    request = json.loads(message["data"])
+                    self._cancel_local(request["stream_id"], request.get("reason", "Stream cancelled"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Stream cancel listener failed, reconnecting: {e}")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    async def close(self):
+        """Cancel local generations and the cancel listener"""
+        tasks = [*self._tasks.values(), *self._background]
+        if self._listener:
+            tasks.append(self._listener)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._listener = None
+
+stream_registry = StreamRegistry()
@@ -0,0 +1,14 @@
+import fakeredis.aioredis
+import pytest
+
+import core.redis_client
+
+@pytest.fixture
+async def redis(monkeypatch):
+    """In-memory Redis behind core.redis_client.get_redis"""
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    await client.flushall()
+    monkeypatch.setattr(core.redis_client, "_redis", client)
+    yield client
+    await client.flushall()
+    await client.aclose()
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+from sqlalchemy import JSON, inspect, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+import os
+import pytest
+
+pytest.importorskip("models.conversation")
+
+from core.database import Base
+from models.archive import ConversationArchive
+from models.conversation import Conversation, Message
+from services.archive_service import ArchiveService, LocalArchiveStore
+
+# Whatever the model calls its JSON column, it must survive the round trip
+JSON_ATTR = next(
+    attr.key for attr in inspect(Message).column_attrs if isinstance(attr.columns[0].type, JSON)
+)
+
+class RacingStore(LocalArchiveStore):
+    """Runs `on_put` while the blob is written, i.e. after the messages were read"""
+
+    def __init__(self, root, on_put):
+        super().__init__(root)
+        self.on_put = on_put
+
+    async def put(self, key, data):
+        await self.on_put()
+        await super().put(key, data)
+
+@pytest.fixture
+async def sessionmaker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'archive.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+def blobs(root):
+    return sorted(
+        os.path.relpath(os.path.join(path, name), root)
+        for path, _, names in os.walk(root) for name in names
+    )
+
+async def add_conversation(db, *ages_days):
+    now = datetime.now(timezone.utc)
+    conversation = Conversation(user_id=uuid4())
+    db.add(conversation)
+    await db.flush()
+    for i, age in enumerate(ages_days):
+        db.add(Message(
+            conversation_id=conversation.id,
+            role="user" if i % 2 == 0 else "assistant",
+            content=f"message {i}",
+            created_at=now - timedelta(days=age),
+            **{JSON_ATTR: {"turn": i, "tags": ["a", "b"]}},
+        ))
+    await db.commit()
+    return conversation.id
+
+async def load_messages(db, conversation_id):
+    result = await db.execute(
+        select(Message).where(Message.conversation_id == conversation_id).order_by(Message.created_at)
+    )
+    return [
+        {attr.key: getattr(msg, attr.key) for attr in inspect(Message).column_attrs}
+        for msg in result.scalars().all()
+    ]
+
+async def test_archive_and_rehydrate_round_trip(sessionmaker, tmp_path):
+    service = ArchiveService(LocalArchiveStore(str(tmp_path / "blobs")))
+    async with sessionmaker() as db:
+        conversation_id = await add_conversation(db, 100, 99, 98)
+        before = await load_messages(db, conversation_id)
+
+        assert await service.archive_conversation(db, conversation_id) == 3
+        assert await load_messages(db, conversation_id) == []
+        assert len(blobs(tmp_path / "blobs")) == 1
+
+        assert await service.rehydrate(db, conversation_id) is True
+        db.expunge_all()
+        assert await load_messages(db, conversation_id) == before
+        assert await db.get(ConversationArchive, conversation_id) is None
+        assert blobs(tmp_path / "blobs") == []
+
+        # Already restored: nothing left to do
+        assert await service.rehydrate(db, conversation_id) is False
+
+async def test_message_written_during_archive_stays_live(sessionmaker, tmp_path):
+    async with sessionmaker() as db:
+        conversation_id = await add_conversation(db, 100, 99)
+
+    async def write_turn():
+        async with sessionmaker() as other:
+            other.add(Message(conversation_id=conversation_id, role="user", content="late"))
+            await other.commit()
+
+    service = ArchiveService(RacingStore(str(tmp_path / "blobs"), write_turn))
+    async with sessionmaker() as db:
+        assert await service.archive_conversation(db, conversation_id) == 2
+        remaining = await load_messages(db, conversation_id)
+
+    assert [row["content"] for row in remaining] == ["late"]
+
+async def test_rearchive_merges_parts_and_deletes_old_blob(sessionmaker, tmp_path):
+    service = ArchiveService(LocalArchiveStore(str(tmp_path / "blobs")))
+    async with sessionmaker() as db:
+        conversation_id = await add_conversation(db, 100, 99)
+        await service.archive_conversation(db, conversation_id)
+        first_blobs = blobs(tmp_path / "blobs")
+
+        db.add(Message(conversation_id=conversation_id, role="user", content="newer"))
+        await db.commit()
+        assert await service.archive_conversation(db, conversation_id) == 3
+
+        second_blobs = blobs(tmp_path / "blobs")
+        assert len(second_blobs) == 1 and second_blobs != first_blobs
+
+        assert await service.rehydrate(db, conversation_id) is True
+        db.expunge_all()
+        contents = [row["content"] for row in await load_messages(db, conversation_id)]
+
+    assert contents == ["message 0", "message 1", "newer"]
+
+async def test_find_cold_conversations_skips_recent_activity(sessionmaker, tmp_path):
+    service = ArchiveService(LocalArchiveStore(str(tmp_path / "blobs")))
+    async with sessionmaker() as db:
+        cold_id = await add_conversation(db, 200, 150)
+        active_id = await add_conversation(db, 200, 1)
+        await add_conversation(db)  # No messages yet
+
+        cutoff = datetime.now(timezone.utc) - timedelta(days=90)
+        assert await service.find_cold_conversations(db, cutoff, limit=10) == [cold_id]
+
+        assert await service.archive_cold_conversations(db, older_than_days=90) == 1
+        assert await db.get(ConversationArchive, cold_id) is not None
+        assert await db.get(ConversationArchive, active_id) is None
@@ -0,0 +1,127 @@
+from contextlib import asynccontextmanager
+from uuid import uuid4
+from sqlalchemy.engine import make_url
+import asyncio
+import time
+
+from core.config import settings
+from core.db_router import DatabaseRouter, Replica
+import core.db_router
+
+class FakeReplica:
+    def __init__(self, name, in_flight=0, lag=0.0):
+        self.name = name
+        self.in_flight = in_flight
+        self.lag = lag
+        self.sessions_opened = 0
+
+    async def refresh_lag(self):
+        pass
+
+    @asynccontextmanager
+    async def _session(self):
+        self.sessions_opened += 1
+        yield self
+
+    def sessionmaker(self):
+        return self._session()
+
+def make_router(*replicas) -> DatabaseRouter:
+    router = DatabaseRouter(replica_urls=[])
+    router._replicas = list(replicas)
+    return router
+
+async def test_pick_replica_prefers_fewest_in_flight():
+    busy, idle = FakeReplica("busy", in_flight=3), FakeReplica("idle", in_flight=1)
+    router = make_router(busy, idle)
+
+    assert await router.pick_replica() is idle
+
+async def test_pick_replica_skips_lagging_replicas(monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_MAX_LAG_SECONDS", 5.0)
+    lagging = FakeReplica("lagging", in_flight=0, lag=30.0)
+    current = FakeReplica("current", in_flight=5, lag=1.0)
+    router = make_router(lagging, current)
+
+    assert await router.pick_replica() is current
+
+    current.lag = float("inf")
+    assert await router.pick_replica() is None
+
+async def test_pick_replica_breaks_ties_randomly(monkeypatch):
+    replicas = [FakeReplica(f"r{i}", in_flight=2) for i in range(3)]
+    router = make_router(*replicas, FakeReplica("busy", in_flight=4))
+    monkeypatch.setattr(core.db_router.random, "choice", lambda options: options[-1])
+
+    assert await router.pick_replica() is replicas[-1]
+
+async def test_writes_are_sticky_across_routers(redis, monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_READ_YOUR_WRITES_SECONDS", 10.0)
+    conversation_id = uuid4()
+    writer = make_router(FakeReplica("a"))
+    # A second router stands in for another worker process
+    reader = make_router(FakeReplica("b"))
+
+    await writer.mark_write(conversation_id)
+
+    assert await reader.is_sticky(str(conversation_id).upper())
+    assert not await reader.is_sticky(uuid4())
+    ttl = await redis.pttl(DatabaseRouter.STICKY_PREFIX + str(conversation_id))
+    assert 0 < ttl <= 10000
+
+async def test_sticky_marker_expires(redis, monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_READ_YOUR_WRITES_SECONDS", 10.0)
+    conversation_id = uuid4()
+    router = make_router(FakeReplica("a"))
+
+    await router.mark_write(conversation_id)
+    await redis.delete(DatabaseRouter.STICKY_PREFIX + str(conversation_id))
+
+    assert not await router.is_sticky(conversation_id)
+
+async def test_read_session_routes_sticky_reads_to_primary(redis):
+    replica = FakeReplica("a")
+    router = make_router(replica)
+    conversation_id = uuid4()
+
+    async with router.read_session(conversation_id) as session:
+        assert session is replica
+        assert replica.in_flight == 1
+    assert replica.in_flight == 0
+
+    await router.mark_write(conversation_id)
+    async with router.read_session(conversation_id) as session:
+        assert session is not replica
+    assert replica.sessions_opened == 1
+
+async def test_redis_failure_falls_back_to_primary(monkeypatch):
+    class BrokenRedis:
+        async def exists(self, key):
+            raise ConnectionError("redis down")
+
+    monkeypatch.setattr(core.db_router, "get_redis", lambda: BrokenRedis())
+    router = make_router(FakeReplica("a"))
+
+    assert await router.is_sticky(uuid4())
+
+class UnreachableEngine:
+    """Engine whose connections never open, like a replica behind a dropped route"""
+
+    url = make_url("postgresql+asyncpg://replica-1/app")
+
+    @asynccontextmanager
+    async def connect(self):
+        await asyncio.sleep(60)
+        yield
+
+async def test_hanging_lag_probe_times_out_as_lagging(monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_LAG_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(core.db_router, "create_async_engine", lambda url, **kwargs: UnreachableEngine())
+    replica = Replica("postgresql+asyncpg://replica-1/app")
+
+    started = time.monotonic()
+    await replica.refresh_lag()
+
+    assert time.monotonic() - started < 1
+    assert replica.lag == float("inf")
+    assert replica.lag_checked_at > 0
@@ -0,0 +1,134 @@
+import asyncio
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from core.config import settings
+from schemas.evaluation import Rubric, Submission
+from services.evaluation_service import EvaluationService
+
+RUBRIC = Rubric(
+    id="case-1",
+    name="Case study",
+    criteria=[
+        {"key": "analysis", "description": "Depth of analysis", "max_score": 10},
+        {"key": "clarity", "description": "Clarity of writing", "max_score": 5},
+        {"key": "evidence", "description": "Use of evidence", "max_score": 5},
+    ],
+)
+SUBMISSION = Submission(id="sub-1", text="The company should expand into new markets.")
+
+class FakeLLM:
+    """Stands in for LLMService.generate_structured and records call order"""
+
+    default_model = "gpt-test"
+
+    def __init__(self, responses=None, delay=0.01):
+        self.responses = list(responses or [])
+        self.delay = delay
+        self.events = []
+        self.active = 0
+        self.max_active = 0
+
+    async def generate_structured(self, prefix, instruction, schema, schema_name,
+                                  model=None, temperature=0.0, max_tokens=1024):
+        call = (prefix[1], instruction)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        self.events.append(("start", call))
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        self.events.append(("end", call))
+        if self.responses:
+            return self.responses.pop(0), 10
+        if schema_name == "criterion_score":
+            return json.dumps({"score": 3, "rationale": "ok"}), 10
+        return json.dumps({key: {"score": 3, "rationale": "ok"} for key in schema["required"]}), 10
+
+def all_scores(**scores):
+    return json.dumps({key: {"score": score, "rationale": "r"} for key, score in scores.items()})
+
+@pytest.fixture(autouse=True)
+def evaluation_settings(monkeypatch):
+    monkeypatch.setattr(settings, "EVALUATION_MAX_RETRIES", 1)
+    monkeypatch.setattr(settings, "EVALUATION_MAX_CONCURRENCY", 8)
+
+async def test_single_mode_parses_every_criterion():
+    llm = FakeLLM([all_scores(analysis=8, clarity=4, evidence=2)])
+
+    result = await EvaluationService(llm).evaluate(RUBRIC, SUBMISSION, mode="single")
+
+    assert [(s.criterion, s.score, s.max_score) for s in result.scores] == [
+        ("analysis", 8, 10), ("clarity", 4, 5), ("evidence", 2, 5)
+    ]
+    assert (result.total_score, result.max_total_score, result.token_count) == (14, 20, 10)
+
+async def test_out_of_range_score_is_retried():
+    llm = FakeLLM([
+        all_scores(analysis=8, clarity=9, evidence=2),
+        all_scores(analysis=8, clarity=5, evidence=2),
+    ])
+
+    result = await EvaluationService(llm).evaluate(RUBRIC, SUBMISSION, mode="single")
+
+    assert result.total_score == 15
+    assert result.token_count == 20
+
+async def test_invalid_output_fails_after_retries():
+    llm = FakeLLM(["not json", all_scores(analysis=8, clarity=4)])
+
+    with pytest.raises(ValueError, match="Invalid structured output"):
+        await EvaluationService(llm).evaluate(RUBRIC, SUBMISSION, mode="single")
+    assert len(llm.events) == 4
+
+async def test_parallel_mode_warms_the_prefix_with_one_call():
+    llm = FakeLLM()
+
+    result = await EvaluationService(llm).evaluate(RUBRIC, SUBMISSION, mode="parallel")
+
+    assert [s.criterion for s in result.scores] == ["analysis", "clarity", "evidence"]
+    first = llm.events[0][1]
+    assert llm.events[1] == ("end", first)
+    assert llm.max_active == 2
+
+async def test_cohort_warms_the_rubric_with_the_first_submission():
+    llm = FakeLLM()
+    submissions = [Submission(id=f"sub-{i}", text=f"Answer {i}") for i in range(4)]
+
+    result = await EvaluationService(llm).evaluate_cohort(RUBRIC, submissions, mode="single")
+
+    assert [r.submission_id for r in result.results] == [s.id for s in submissions]
+    assert llm.events[0][1][0].startswith("Submission sub-0:")
+    assert llm.events[1][0] == "end"
+    assert llm.max_active == 3
+
+async def test_llm_calls_share_one_concurrency_limit(monkeypatch):
+    monkeypatch.setattr(settings, "EVALUATION_MAX_CONCURRENCY", 2)
+    llm = FakeLLM()
+    submissions = [Submission(id=f"sub-{i}", text=f"Answer {i}") for i in range(5)]
+
+    result = await EvaluationService(llm).evaluate_cohort(RUBRIC, submissions, mode="parallel")
+
+    assert len(result.results) == 5
+    assert llm.max_active == 2
+
+async def test_cohort_reports_failures_per_submission():
+    llm = FakeLLM(["bad", "bad"])
+    submissions = [Submission(id="sub-0", text="a"), Submission(id="sub-1", text="b")]
+
+    result = await EvaluationService(llm).evaluate_cohort(RUBRIC, submissions)
+
+    assert [e.submission_id for e in result.errors] == ["sub-0"]
+    assert [r.submission_id for r in result.results] == ["sub-1"]
+
+def test_rubric_rejects_duplicate_criterion_keys():
+    with pytest.raises(ValidationError, match="Duplicate criterion keys: clarity"):
+        Rubric(
+            id="case-1",
+            name="Case study",
+            criteria=[
+                {"key": "clarity", "description": "a"},
+                {"key": "clarity", "description": "b"},
+            ],
+        )
@@ -0,0 +1,32 @@
+from scripts.import_benchmark import benchmarked_trees, package_costs, parse_importtime
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       240 |        240 |   _io
+import time:        31 |         31 |   marshal
+import time:       321 |        592 | _frozen_importlib_external
+import time:       500 |        500 |     pydantic_core
+import time:       900 |       1400 |   core.config
+import time:       100 |        100 |     sqlalchemy.sql
+import time:       200 |        300 |   sqlalchemy
+import time:        50 |         50 | core
+import time:       300 |       2050 | core.database
+"""
+
+def test_parse_importtime_keeps_depth():
+    entries = parse_importtime(IMPORTTIME_OUTPUT)
+
+    assert entries[0] == (1, "_io", 240, 240)
+    assert entries[3] == (2, "pydantic_core", 500, 500)
+    assert entries[-1] == (0, "core.database", 300, 2050)
+
+def test_startup_imports_are_excluded():
+    trees = benchmarked_trees(parse_importtime(IMPORTTIME_OUTPUT), ["core.database"])
+
+    assert [root[1] for root, _ in trees] == ["core", "core.database"]
+    assert sum(root[3] for root, _ in trees) == 2100
+
+def test_package_costs_count_direct_imports_only():
+    trees = benchmarked_trees(parse_importtime(IMPORTTIME_OUTPUT), ["core.database"])
+
+    assert package_costs(trees) == [("core", 1400), ("sqlalchemy", 300)]
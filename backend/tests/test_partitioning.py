@@ -0,0 +1,133 @@
+from datetime import date
+from sqlalchemy import Column, DateTime, MetaData, String, Table, Uuid, inspect
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.schema import CreateTable
+
+from core.partitioning import (
+    DEFAULT_PARTITION, MESSAGE_HISTORY_INDEX, _month_start, _parse_partition_name,
+    _partition_name, ensure_history_index, ensure_message_partitions, prepare_message_table
+)
+
+def make_messages_table() -> Table:
+    return Table(
+        "messages",
+        MetaData(),
+        Column("id", Uuid, primary_key=True),
+        Column("conversation_id", Uuid, nullable=False),
+        Column("content", String),
+        Column("created_at", DateTime(timezone=True)),
+    )
+
+def test_month_start_offsets_across_years():
+    assert _month_start(date(2026, 1, 15)) == date(2026, 1, 1)
+    assert _month_start(date(2026, 1, 15), -1) == date(2025, 12, 1)
+    assert _month_start(date(2026, 11, 30), 3) == date(2027, 2, 1)
+    assert _month_start(date(2026, 3, 1), -15) == date(2024, 12, 1)
+
+def test_parse_partition_name_round_trips():
+    month = date(2026, 7, 1)
+
+    assert _partition_name(month) == "messages_p2026_07"
+    assert _parse_partition_name(_partition_name(month)) == month
+
+def test_parse_partition_name_ignores_foreign_tables():
+    assert _parse_partition_name(DEFAULT_PARTITION) is None
+    assert _parse_partition_name("messages_p2026_13") is None
+    assert _parse_partition_name("messages_pold") is None
+    assert _parse_partition_name("conversations_p2026_01") is None
+
+def test_prepare_partitioned_table_ddl():
+    table = make_messages_table()
+
+    prepare_message_table(table, partitioned=True)
+    prepare_message_table(table, partitioned=True)
+    ddl = str(CreateTable(table).compile(dialect=postgresql.dialect()))
+
+    assert "PRIMARY KEY (id, created_at)" in ddl
+    assert "PARTITION BY RANGE (created_at)" in ddl
+    assert "created_at TIMESTAMP WITH TIME ZONE NOT NULL" in ddl
+    assert [index.name for index in table.indexes] == [MESSAGE_HISTORY_INDEX]
+
+def test_prepare_unpartitioned_table_only_adds_index():
+    table = make_messages_table()
+
+    prepare_message_table(table, partitioned=False)
+    ddl = str(CreateTable(table).compile(dialect=postgresql.dialect()))
+
+    assert "PRIMARY KEY (id)" in ddl
+    assert "PARTITION BY" not in ddl
+    assert [index.name for index in table.indexes] == [MESSAGE_HISTORY_INDEX]
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+        self.rowcount = len(rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+class FakeConnection:
+    """Records SQL and answers the catalog queries ensure_message_partitions runs"""
+
+    def __init__(self, partitions, default_months=()):
+        self.partitions = partitions
+        self.default_months = default_months
+        self.statements = []
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        if "FROM pg_inherits" in sql:
+            return FakeResult([(name,) for name in self.partitions])
+        if "date_trunc" in sql:
+            return FakeResult([(month,) for month in self.default_months])
+        return FakeResult([])
+
+async def test_ensure_partitions_creates_window_and_default():
+    conn = FakeConnection(partitions=[])
+
+    created = await ensure_message_partitions(conn, months_ahead=1, today=date(2026, 12, 5))
+
+    assert created == ["messages_p2026_12", "messages_p2027_01", DEFAULT_PARTITION]
+    assert not any("date_trunc" in sql for sql in conn.statements)
+    assert any(
+        "PARTITION OF \"messages\" FOR VALUES FROM ('2026-12-01') TO ('2027-01-01')" in sql
+        for sql in conn.statements
+    )
+
+async def test_ensure_partitions_moves_rows_out_of_default():
+    conn = FakeConnection(
+        partitions=["messages_p2026_09", DEFAULT_PARTITION],
+        default_months=[date(2026, 10, 1)],
+    )
+
+    created = await ensure_message_partitions(conn, months_ahead=0, today=date(2026, 10, 19))
+
+    assert created == ["messages_p2026_10"]
+    ddl = [sql for sql in conn.statements if "messages_p2026_10" in sql]
+    assert ddl[0].startswith('CREATE TABLE "messages_p2026_10" (LIKE "messages"')
+    assert 'DELETE FROM "messages_default"' in ddl[1]
+    assert 'INSERT INTO "messages_p2026_10"' in ddl[1]
+    assert ddl[2] == (
+        'ALTER TABLE "messages" ATTACH PARTITION "messages_p2026_10" '
+        "FOR VALUES FROM ('2026-10-01') TO ('2026-11-01')"
+    )
+    assert not any("PARTITION OF" in sql for sql in conn.statements)
+
+async def test_history_index_added_to_existing_table(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'messages.db'}")
+    table = make_messages_table()
+    async with engine.begin() as conn:
+        # A table created before the index existed
+        await conn.run_sync(table.metadata.create_all)
+        prepare_message_table(table, partitioned=False)
+        await conn.run_sync(table.metadata.create_all)
+        await ensure_history_index(conn, table)
+        # Idempotent on every boot
+        await ensure_history_index(conn, table)
+        indexes = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_indexes("messages"))
+    await engine.dispose()
+
+    assert [index["name"] for index in indexes] == [MESSAGE_HISTORY_INDEX]
+    assert indexes[0]["column_names"] == ["conversation_id", "created_at"]
@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+
+from core.config import settings
+from services.llm_service import LLMService
+from services.speculative_service import SpeculativeEngine
+
+HISTORY = [
+    {"role": "user", "content": "x" * 4000},
+    {"role": "assistant", "content": "y" * 4000},
+]
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    calls = []
+
+    async def generate_response(self, message, history=None, context=None, model=None,
+                                temperature=0.7, max_tokens=4096):
+        calls.append(message)
+        return f"answer to {message}", 7
+
+    monkeypatch.setattr(LLMService, "generate_response", generate_response)
+    return calls
+
+@pytest.fixture(autouse=True)
+def speculation_settings(monkeypatch):
+    monkeypatch.setattr(settings, "SPECULATIVE_ENABLED", True)
+    monkeypatch.setattr(settings, "SPECULATIVE_FOLLOWUPS", {"default": ["Summarise", "Give a score"]})
+    monkeypatch.setattr(settings, "SPECULATIVE_MAX_PER_TURN", 2)
+    monkeypatch.setattr(settings, "SPECULATIVE_MAX_CONCURRENCY", 4)
+    monkeypatch.setattr(settings, "SPECULATIVE_MAX_TOKENS", 1024)
+    monkeypatch.setattr(settings, "SPECULATIVE_TOKEN_BUDGET_PER_HOUR", 50000)
+    monkeypatch.setattr(settings, "SPECULATIVE_MIN_SAMPLES", 20)
+    monkeypatch.setattr(settings, "SPECULATIVE_MIN_HIT_RATE", 0.2)
+
+async def drain(engine: SpeculativeEngine):
+    while engine._tasks:
+        await asyncio.gather(*list(engine._tasks))
+
+def test_estimate_includes_the_prompt():
+    estimate = SpeculativeEngine.estimate_tokens("Summarise", HISTORY)
+
+    assert estimate >= settings.SPECULATIVE_MAX_TOKENS + 8000 // 4
+
+async def test_skips_when_the_prompt_does_not_fit_the_budget(redis, llm_calls, monkeypatch):
+    monkeypatch.setattr(settings, "SPECULATIVE_TOKEN_BUDGET_PER_HOUR", 2000)
+    engine = SpeculativeEngine()
+
+    engine.schedule("default", "conv-1", "gpt-4", HISTORY)
+    await drain(engine)
+
+    assert llm_calls == []
+    stats = await engine.stats("default")
+    assert stats.skipped_budget == 2
+    assert stats.scheduled == 0
+
+async def test_budget_is_settled_to_actual_spend(redis, llm_calls):
+    engine = SpeculativeEngine()
+
+    engine.schedule("default", "conv-1", "gpt-4", HISTORY)
+    await drain(engine)
+
+    assert sorted(llm_calls) == ["Give a score", "Summarise"]
+    assert int(await redis.get(engine._budget_key("default"))) == 14
+    stats = await engine.stats("default")
+    assert (stats.scheduled, stats.completed, stats.tokens_spent) == (2, 2, 14)
+
+async def test_budget_is_shared_across_workers(redis, llm_calls, monkeypatch):
+    estimate = SpeculativeEngine.estimate_tokens("Summarise", HISTORY)
+    monkeypatch.setattr(settings, "SPECULATIVE_TOKEN_BUDGET_PER_HOUR", estimate + estimate // 2)
+    monkeypatch.setattr(settings, "SPECULATIVE_MAX_PER_TURN", 1)
+    release = asyncio.Event()
+
+    async def slow_generate(self, message, **kwargs):
+        await release.wait()
+        return "answer", 7
+
+    monkeypatch.setattr(LLMService, "generate_response", slow_generate)
+    worker_a, worker_b = SpeculativeEngine(), SpeculativeEngine()
+
+    worker_a.schedule("default", "conv-1", "gpt-4", HISTORY)
+    await asyncio.sleep(0.05)  # worker A holds its reservation while generating
+    worker_b.schedule("default", "conv-2", "gpt-4", HISTORY)
+    await drain(worker_b)
+    release.set()
+    await drain(worker_a)
+
+    stats = await worker_b.stats("default")
+    assert (stats.scheduled, stats.skipped_budget) == (1, 1)
+
+async def test_low_hit_rate_pauses_the_tenant_everywhere(redis, llm_calls, monkeypatch):
+    monkeypatch.setattr(settings, "SPECULATIVE_COOLDOWN_SECONDS", 600)
+    engine = SpeculativeEngine()
+    await redis.hset(engine._key("stats", "default"), mapping={"completed": 20, "hits": 1})
+
+    engine.schedule("default", "conv-1", "gpt-4", HISTORY)
+    await drain(engine)
+
+    assert llm_calls == []
+    assert 0 < await redis.ttl(engine._key("paused", "default")) <= 600
+    # The sample restarts after the cooldown, and other workers see the pause
+    assert (await engine.stats("default")).completed == 0
+    other_worker = SpeculativeEngine()
+    other_worker.schedule("default", "conv-1", "gpt-4", HISTORY)
+    await drain(other_worker)
+    assert llm_calls == []
+
+async def test_lookup_serves_precomputed_responses(redis, llm_calls):
+    engine = SpeculativeEngine()
+    engine.schedule("default", "conv-1", "gpt-4", HISTORY)
+    await drain(engine)
+
+    hit = await engine.lookup("default", "conv-1", "gpt-4", "summarise!", HISTORY)
+    miss = await engine.lookup("default", "conv-1", "gpt-4", "Summarise", HISTORY[:1])
+
+    assert hit == ("answer to Summarise", 7)
+    assert miss is None
+    stats = await SpeculativeEngine().stats("default")
+    assert (stats.hits, stats.misses, stats.tokens_served) == (1, 1, 7)
+    assert await redis.hget(engine._key("template_hits", "default"), "summarise") == "1"
+
+class RateLimited(Exception):
+    status_code = 429
+
+@pytest.mark.parametrize("error, refunded", [
+    (RateLimited("slow down"), True),
+    (ValueError("Unsupported model"), True),
+    (TimeoutError("read timed out"), False),
+])
+async def test_failed_calls_refund_only_when_nothing_was_generated(redis, monkeypatch, error, refunded):
+    async def generate_response(self, *args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(LLMService, "generate_response", generate_response)
+    engine = SpeculativeEngine()
+    estimate = SpeculativeEngine.estimate_tokens("Summarise", HISTORY)
+
+    engine.schedule("default", "conv-1", "gpt-4", HISTORY)
+    await drain(engine)
+
+    used = int(await redis.get(engine._budget_key("default")))
+    assert used == (0 if refunded else 2 * estimate)
+
+async def test_cancelled_calls_keep_their_reservation(redis, monkeypatch):
+    started = []
+
+    async def generate_response(self, *args, **kwargs):
+        started.append(kwargs["message"])
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(LLMService, "generate_response", generate_response)
+    engine = SpeculativeEngine()
+    estimate = SpeculativeEngine.estimate_tokens("Summarise", HISTORY)
+
+    engine.schedule("default", "conv-1", "gpt-4", HISTORY)
+    while len(started) < 2:
+        await asyncio.sleep(0.01)
+    await engine.close()
+
+    assert int(await redis.get(engine._budget_key("default"))) == 2 * estimate
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from core.config import settings
+from services.stream_registry import StreamRegistry
+
+@pytest.fixture
+async def registry(redis):
+    registry = StreamRegistry()
+    yield registry
+    await registry.close()
+
+async def collect(buffer, offset=0):
+    return [event async for event in buffer.read_from(offset)]
+
+async def test_resume_from_offset_replays_the_tail(registry):
+    buffer = await registry.create("user-1")
+    buffer.conversation_id = "conv-1"
+    for chunk in ["a", "b", "c"]:
+        await buffer.append(chunk)
+    await buffer.finish(message_id="msg-1")
+
+    events = await collect(await registry.get(buffer.stream_id, "user-1"), offset=1)
+
+    assert events == [
+        {"type": "chunk", "offset": 1, "chunk": "b"},
+        {"type": "chunk", "offset": 2, "chunk": "c"},
+        {"type": "done", "conversation_id": "conv-1", "message_id": "msg-1"},
+    ]
+
+async def test_reader_follows_a_live_stream(registry):
+    buffer = await registry.create("user-1")
+    reader = asyncio.create_task(collect(buffer))
+
+    for chunk in ["a", "b"]:
+        await asyncio.sleep(0.01)
+        await buffer.append(chunk)
+    await buffer.finish(error="boom")
+
+    events = await asyncio.wait_for(reader, 2)
+    assert [event["type"] for event in events] == ["chunk", "chunk", "error"]
+    assert events[-1]["error"] == "boom"
+
+async def test_get_checks_the_owner(registry):
+    buffer = await registry.create("user-1")
+
+    assert await registry.get(buffer.stream_id, "user-2") is None
+    assert await registry.get("missing", "user-1") is None
+    assert (await registry.get(buffer.stream_id, "user-1")).stream_id == buffer.stream_id
+
+async def test_orphaned_stream_is_cancelled_after_grace(registry, monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_RESUME_GRACE_SECONDS", 0.05)
+    buffer = await registry.create("user-1")
+    task = registry.start(buffer, asyncio.sleep(60))
+
+    await buffer.attach()
+    await buffer.detach()
+    await asyncio.sleep(0.2)
+
+    assert task.cancelled()
+    assert await collect(buffer) == [{"type": "error", "error": "Client did not resume"}]
+
+async def test_resumed_stream_is_not_cancelled(registry, monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_RESUME_GRACE_SECONDS", 0.05)
+    buffer = await registry.create("user-1")
+    task = registry.start(buffer, asyncio.sleep(60))
+
+    await buffer.attach()
+    await buffer.detach()
+    # The client reconnects, possibly to another worker
+    await (await registry.get(buffer.stream_id, "user-1")).attach()
+    await asyncio.sleep(0.2)
+
+    assert not task.done()
+
+async def test_cancel_reaches_the_worker_running_the_generation(redis, registry):
+    other_worker = StreamRegistry()
+    buffer = await registry.create("user-1")
+    task = registry.start(buffer, asyncio.sleep(60))
+    await asyncio.sleep(0.05)  # Let the cancel listener subscribe
+
+    await other_worker.cancel(buffer.stream_id)
+    events = await asyncio.wait_for(collect(buffer), 2)
+
+    assert task.cancelled()
+    assert events == [{"type": "error", "error": "Stream cancelled"}]
+    await other_worker.close()
+
+async def test_generation_that_ends_without_finishing_reports_an_error(registry):
+    buffer = await registry.create("user-1")
+
+    async def generate():
+        await buffer.append("a")
+
+    await registry.start(buffer, generate())
+
+    assert await collect(buffer) == [
+        {"type": "chunk", "offset": 0, "chunk": "a"},
+        {"type": "error", "error": "Stream ended unexpectedly"},
+    ]
+
+async def test_live_generations_are_capped_per_user(registry, monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_MAX_LIVE_PER_USER", 2)
+    first = await registry.create("user-1")
+    second = await registry.create("user-1")
+    task = registry.start(first, asyncio.sleep(60))
+    registry.start(second, asyncio.sleep(60))
+
+    # Another connection or worker counts against the same limit
+    assert await StreamRegistry().create("user-1") is None
+    assert await registry.create("user-2") is not None
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert await registry.create("user-1") is not None
+
+async def test_stale_live_entries_expire(registry, redis, monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_MAX_LIVE_PER_USER", 1)
+    buffer = await registry.create("user-1")
+    # The worker running it died: nothing renews or releases the entry
+    await redis.zadd(buffer.live_key, {buffer.stream_id: 0})
+
+    assert await registry.create("user-1") is not None